@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Group, Post
+from .search import matching_ids
 
 
 @admin.register(Post)
@@ -10,6 +11,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE '%...%'."""
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -0,0 +1,172 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+
+from yatube.metrics import record_cache
+
+from .conditional import conditional
+from .feed import FeedPaginator
+from .models import Group, Post, User
+from .paginators import CursorPaginator
+from .versions import (GLOBAL, follow_tag, group_tag, post_tag,
+                       versioned_key)
+from .views import author_tags, group_tags, profile_tags
+
+# JSON-версия лент для мобильных клиентов. Посты читаются через
+# values(): страница — это список словарей, модели не создаются.
+# Поле ответа -> поле для values().
+FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'thumbnail': 'thumbnail',
+    'comments_count': 'comments_count',
+    # размеры и заглушка картинки, чтобы клиент сразу отвёл ей место
+    'width': 'image_width',
+    'height': 'image_height',
+    'placeholder': 'image_placeholder',
+}
+DEFAULT_FIELDS = ('id', 'text', 'pub_date', 'author', 'group', 'image',
+                  'thumbnail')
+# без них не построить курсор, их выбирают всегда
+KEY_FIELDS = ('id', 'pub_date')
+PER_PAGE = 10
+MAX_PER_PAGE = 100
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def error_response(message, status):
+    return JsonResponse({'error': message}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def requested_fields(request):
+    """Поля из ?fields=id,text,comments_count или DEFAULT_FIELDS."""
+    value = request.GET.get('fields')
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise APIError(f'Неизвестные поля: {", ".join(unknown)}; '
+                       f'доступны: {", ".join(FIELDS)}')
+    return fields
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', PER_PAGE))
+    except ValueError:
+        raise APIError('limit должен быть числом')
+    return max(1, min(limit, MAX_PER_PAGE))
+
+
+def post_values(queryset, fields):
+    columns = dict.fromkeys([FIELDS[name] for name in fields] + [*KEY_FIELDS])
+    return queryset.values(*columns)
+
+
+def serialize(row, fields):
+    item = {name: row[FIELDS[name]] for name in fields}
+    if item.get('image'):
+        item['image'] = settings.MEDIA_URL + item['image']
+    return item
+
+
+def cached_json(request, tags, build):
+    """Ответ build() в JSON, кешированный под версиями тегов.
+
+    Ключ тот же по устройству, что у страниц HTML-лент, поэтому
+    любой bump() этих тегов сбрасывает и ответы API.
+    """
+    key = versioned_key('api', tags, request.get_full_path())
+    content = cache.get(key)
+    record_cache(content is not None, content is None)
+    if content is None:
+        try:
+            data = build()
+        except APIError as exception:
+            return error_response(str(exception), exception.status)
+        content = json.dumps(data, cls=DjangoJSONEncoder,
+                             ensure_ascii=False)
+        cache.set(key, content, settings.FEED_PAGE_TIMEOUT)
+    return HttpResponse(content, content_type='application/json')
+
+
+def feed_response(request, posts, tags, paginator_class=CursorPaginator,
+                  **kwargs):
+    """Страница ленты по ?cursor= с полями ?fields= и размером ?limit=."""
+    def build():
+        fields = requested_fields(request)
+        rows = post_values(posts, fields)
+        if paginator_class is FeedPaginator:
+            kwargs['posts'] = rows
+        paginator = paginator_class(rows, page_size(request), **kwargs)
+        page = paginator.get_page(request.GET.get('cursor'))
+        return {
+            'results': [serialize(row, fields) for row in page],
+            'next': paginator.next_cursor,
+            'previous': paginator.previous_cursor,
+        }
+    return cached_json(request, tags, build)
+
+
+@conditional(lambda request: [GLOBAL])
+def index(request):
+    return feed_response(request, Post.objects.all(), [GLOBAL])
+
+
+@conditional(group_tags)
+def group_posts(request, slug):
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    if pk is None:
+        return error_response('Группа не найдена', 404)
+    return feed_response(request, Post.objects.filter(group_id=pk),
+                         [group_tag(pk)])
+
+
+@conditional(profile_tags)
+def profile(request, username):
+    pk = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if pk is None:
+        return error_response('Пользователь не найден', 404)
+    return feed_response(request, Post.objects.filter(author_id=pk),
+                         author_tags(pk))
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error_response('Нужна авторизация', 401)
+    return follow_feed(request)
+
+
+@conditional(lambda request: [GLOBAL])
+def follow_feed(request):
+    user = request.user
+    return feed_response(request, Post.objects.all(),
+                         [GLOBAL, follow_tag(user.pk)],
+                         FeedPaginator, user=user)
+
+
+@conditional(lambda request, post_id: [post_tag(post_id)])
+def post(request, post_id):
+    def build():
+        fields = requested_fields(request)
+        row = post_values(Post.objects.filter(pk=post_id), fields).first()
+        if row is None:
+            raise APIError('Пост не найден', 404)
+        return serialize(row, fields)
+    return cached_json(request, [post_tag(post_id)], build)
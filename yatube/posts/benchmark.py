@@ -0,0 +1,283 @@
+import http.cookiejar
+import queue
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Follow, Group, Post, User
+
+# Наборы запросов: (вес, имя URL, нужен ли вход). Имена URL те же,
+# что в posts/urls.py, под ними же собираются результаты.
+MIXES = {
+    'anonymous': [
+        (40, 'index', False),
+        (20, 'groups', False),
+        (15, 'profile', False),
+        (25, 'post', False),
+    ],
+    'members': [
+        (20, 'index', True),
+        (10, 'groups', True),
+        (10, 'profile', True),
+        (25, 'post', True),
+        (25, 'follow_index', True),
+        (10, 'add_comment', True),
+    ],
+    'mixed': [
+        (30, 'index', False),
+        (10, 'groups', False),
+        (10, 'profile', False),
+        (20, 'post', False),
+        (5, 'index', True),
+        (5, 'post', True),
+        (15, 'follow_index', True),
+        (5, 'add_comment', True),
+    ],
+}
+SAMPLE_SIZE = 1000
+
+
+def parse_mix(spec):
+    """Имя набора из MIXES или строка вида 'index=40,follow_index@user=20'."""
+    if spec in MIXES:
+        return MIXES[spec]
+    mix = []
+    for part in spec.split(','):
+        name, weight = part.split('=')
+        name, _, auth = name.partition('@')
+        mix.append((int(weight), name.strip(), auth == 'user'))
+    return mix
+
+
+class Sample:
+    """Случайные, но воспроизводимые адреса по данным из базы."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.slugs = list(
+            Group.objects.values_list('slug', flat=True)[:SAMPLE_SIZE])
+        self.posts = list(Post.objects.order_by('-pk').values_list(
+            'pk', 'author__username')[:SAMPLE_SIZE])
+        self.users = list(Follow.objects.order_by('user').values_list(
+            'user', flat=True).distinct()[:SAMPLE_SIZE]) or list(
+            User.objects.values_list('pk', flat=True)[:SAMPLE_SIZE])
+        if not self.posts or not self.users:
+            raise ValueError('Нужны посты и пользователи: см. seed_scale')
+
+    def request(self, name):
+        """(метод, путь, данные формы) для запроса к URL name."""
+        pk, username = self.rng.choice(self.posts)
+        if name == 'groups':
+            slug = self.rng.choice(self.slugs) if self.slugs else 'none'
+            return 'GET', reverse('groups', kwargs={'slug': slug}), None
+        if name == 'profile':
+            return 'GET', reverse('profile', args=[username]), None
+        if name == 'post':
+            return 'GET', reverse('post', args=[username, pk]), None
+        if name == 'add_comment':
+            text = f'Комментарий нагрузочного теста {self.rng.random()}'
+            return ('POST', reverse('add_comment', args=[username, pk]),
+                    {'text': text})
+        return 'GET', reverse(name), None
+
+    def plan(self, mix, count):
+        weights = [weight for weight, _, _ in mix]
+        for _ in range(count):
+            _, name, auth = self.rng.choices(mix, weights)[0]
+            user_id = self.rng.choice(self.users) if auth else None
+            yield (name, user_id) + self.request(name)
+
+
+class ClientTransport:
+    """Запросы через тестовый клиент Django в этом же процессе.
+
+    Считает и SQL-запросы каждого ответа: соединение с базой своё
+    у каждого потока, так что счётчики потоков не смешиваются.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def client(self, user_id):
+        clients = self.local.__dict__.setdefault('clients', {})
+        if user_id not in clients:
+            clients[user_id] = Client()
+            if user_id is not None:
+                clients[user_id].force_login(User.objects.get(pk=user_id))
+        return clients[user_id]
+
+    def send(self, user_id, method, path, data):
+        client = self.client(user_id)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            if method == 'POST':
+                response = client.post(path, data)
+            else:
+                response = client.get(path)
+            elapsed = time.perf_counter() - started
+        return elapsed, response.status_code, len(queries)
+
+    def close(self):
+        connections.close_all()
+
+
+class ServerTransport:
+    """Запросы по HTTP к запущенному серверу (runserver, gunicorn...).
+
+    Сессии пользователей создаются прямо в общей базе, как это делает
+    Client.force_login; токен CSRF берётся со страницы входа.
+    Число SQL-запросов отсюда не видно, в отчёте оно пустое.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def session_cookie(self, user_id):
+        with self.lock:
+            if user_id not in self.sessions:
+                client = Client()
+                client.force_login(User.objects.get(pk=user_id))
+                self.sessions[user_id] = client.cookies['sessionid'].value
+            return self.sessions[user_id]
+
+    def opener(self, user_id):
+        openers = self.local.__dict__.setdefault('openers', {})
+        if user_id not in openers:
+            jar = http.cookiejar.CookieJar()
+            opener = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(jar),
+                NoRedirect,
+            )
+            if user_id is not None:
+                self.set_cookie(jar, 'sessionid', self.session_cookie(user_id))
+            opener.open(self.base_url + reverse('login')).read()
+            openers[user_id] = opener, jar
+        return openers[user_id]
+
+    def set_cookie(self, jar, name, value):
+        host = urllib.parse.urlsplit(self.base_url).hostname
+        jar.set_cookie(http.cookiejar.Cookie(
+            0, name, value, None, False, host, False, False, '/', True,
+            False, None, False, None, None, {}))
+
+    def send(self, user_id, method, path, data):
+        opener, jar = self.opener(user_id)
+        body = None
+        if method == 'POST':
+            token = next((cookie.value for cookie in jar
+                          if cookie.name == 'csrftoken'), '')
+            body = urllib.parse.urlencode(
+                {**data, 'csrfmiddlewaretoken': token}).encode()
+        request = urllib.request.Request(
+            self.base_url + path, data=body, method=method,
+            headers={'Referer': self.base_url + path})
+        started = time.perf_counter()
+        try:
+            with opener.open(request) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            status = error.code
+        return time.perf_counter() - started, status, None
+
+    def close(self):
+        pass
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # редирект после POST меряется как отдельный ответ, за ним не ходим
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу; values отсортированы."""
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def drain(transport, tasks, results):
+    while True:
+        try:
+            name, user_id, *request = tasks.get_nowait()
+        except queue.Empty:
+            return
+        results.append((name, *transport.send(user_id, *request)))
+
+
+def worker(transport, tasks, results):
+    try:
+        drain(transport, tasks, results)
+    finally:
+        transport.close()
+
+
+def run(transport, requests, concurrency):
+    """Выполняет запросы в concurrency потоках; вернёт (результаты, время)."""
+    tasks = queue.Queue()
+    for request in requests:
+        tasks.put(request)
+    results = []
+    started = time.perf_counter()
+    if concurrency == 1:
+        # в этом же потоке: так тесты видят данные своей транзакции
+        drain(transport, tasks, results)
+    else:
+        threads = [
+            threading.Thread(target=worker, args=(transport, tasks, results))
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    """Сводка по именам URL: задержки в мс, пропускная способность, SQL."""
+    by_name = {}
+    for name, seconds, status, queries in results:
+        by_name.setdefault(name, []).append((seconds, status, queries))
+    summary = {}
+    for name, rows in sorted(by_name.items()):
+        latencies = sorted(seconds * 1000 for seconds, _, _ in rows)
+        queries = [count for _, _, count in rows if count is not None]
+        summary[name] = {
+            'requests': len(rows),
+            'errors': sum(1 for _, status, _ in rows if status >= 400),
+            'rps': round(len(rows) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.mean(latencies), 2),
+            'queries': (round(statistics.mean(queries), 2)
+                        if queries else None),
+        }
+    return summary
+
+
+def regressions(summary, baseline, tolerance):
+    """Что стало хуже базового прогона больше чем на tolerance процентов."""
+    found = []
+    for name, current in summary.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in ('p95_ms', 'queries'):
+            old, new = before.get(metric), current.get(metric)
+            if old and new and new > old * (1 + tolerance / 100):
+                found.append(f'{name}: {metric} {old} -> {new}')
+    return found
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from .images import UPLOAD_DIR
+from .models import ImageBlob, Post
+from .resize import resize_url
+from .storage import blob_name, blob_storage, is_blob
+from .thumbnails import SPEC
+from .versions import GLOBAL, bump, post_tag
+
+# Счётчики ссылок постов на файлы по хешу (posts/storage.py). Сигналы
+# поста вызывают acquire/release, файл удаляется после коммита, когда
+# ссылок не осталось. Файлы со старыми именами счётчиков не имеют и
+# не удаляются, пока dedup_media не переложит их по хешу.
+CHUNK_SIZE = 1024 * 1024
+# столько постов переписывает за запрос dedup()
+BATCH_SIZE = 500
+# столько живёт файл без ссылок до уборки: пост ещё может сохраняться
+ORPHAN_AGE = 60 * 60
+
+
+def post_blobs(image, image_variants):
+    """Файлы по хешу, на которые ссылается пост: картинка и варианты."""
+    names = {image or ''}
+    if image_variants:
+        variants = json.loads(image_variants)
+        for files in variants['sources'].values():
+            names.update(name for _, name in files)
+        names.add(variants.get('original') or '')
+    return {name for name in names if is_blob(name)}
+
+
+def acquire(names):
+    """Добавляет по ссылке на каждое вхождение имени в names."""
+    counts = defaultdict(list)
+    for name, count in Counter(names).items():
+        counts[count].append(name)
+    if not counts:
+        return
+    ImageBlob.objects.bulk_create(
+        (ImageBlob(name=name) for group in counts.values()
+         for name in group), ignore_conflicts=True)
+    for count, group in counts.items():
+        ImageBlob.objects.filter(name__in=group).update(
+            refs=F('refs') + count)
+
+
+def release(names):
+    """Снимает ссылки; файлы без ссылок удаляются после коммита."""
+    names = set(names)
+    if not names:
+        return
+    ImageBlob.objects.filter(name__in=names, refs__gt=0).update(
+        refs=F('refs') - 1)
+    transaction.on_commit(lambda: collect(names))
+
+
+def is_recent(name, deadline):
+    try:
+        return blob_storage.get_modified_time(name).timestamp() > deadline
+    except FileNotFoundError:
+        return False
+
+
+def collect(names):
+    """Удаляет файлы из names, на которые больше никто не ссылается.
+
+    Файл моложе ORPHAN_AGE остаётся: save() того же содержимого вернёт
+    его имя раньше, чем пост возьмёт ссылку. Его уберёт sweep().
+    Строка ImageBlob заблокирована до удаления файла, так что acquire()
+    параллельного сохранения поста дождётся конца транзакции.
+    """
+    deadline = time.time() - ORPHAN_AGE
+    for name in names:
+        with transaction.atomic():
+            blob = ImageBlob.objects.select_for_update().filter(
+                name=name, refs=0).first()
+            # время файла проверяется уже под блокировкой, прямо перед
+            # удалением: save() могла только что вернуть это имя
+            if blob is None or is_recent(name, deadline):
+                continue
+            blob.delete()
+            blob_storage.delete(name)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def media_files():
+    """Имена файлов в каталоге картинок постов относительно MEDIA_ROOT."""
+    root = blob_storage.path(UPLOAD_DIR)
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if filename.endswith('.upload'):
+                continue
+            path = os.path.join(directory, filename)
+            yield os.path.relpath(path, blob_storage.location).replace(
+                os.sep, '/')
+
+
+def place(name):
+    """Кладёт рядом с файлом name его копию под именем по хешу.
+
+    Копия — жёсткая ссылка, место она не занимает; обычная копия —
+    только если ссылки не поддерживает файловая система.
+    """
+    source = blob_storage.path(name)
+    target = blob_name(name, file_digest(source))
+    path = blob_storage.path(target)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(source, path)
+        except OSError:
+            shutil.copyfile(source, path)
+    return target
+
+
+def rename_references(post, renamed):
+    """Заменяет в посте старые имена файлов; вернёт True, если заменил."""
+    changed = False
+    if post.image and post.image.name in renamed:
+        post.image.name = renamed[post.image.name]
+        if post.thumbnail:
+            post.thumbnail = resize_url(post.image.name, *SPEC)
+        changed = True
+    variants = post.variants
+    for files in variants.get('sources', {}).values():
+        for file in files:
+            if file[1] in renamed:
+                file[1], changed = renamed[file[1]], True
+    if variants.get('original') in renamed:
+        variants['original'], changed = renamed[variants['original']], True
+    if variants and changed:
+        post.image_variants = json.dumps(variants)
+    return changed
+
+
+def recount():
+    """Пересобирает ImageBlob по ссылкам постов; вернёт {имя: ссылок}."""
+    counts = Counter()
+    rows = Post.objects.exclude(image='').values_list(
+        'image', 'image_variants')
+    for image, image_variants in rows.iterator():
+        counts.update(post_blobs(image, image_variants))
+    with transaction.atomic():
+        ImageBlob.objects.all().delete()
+        ImageBlob.objects.bulk_create(
+            ImageBlob(name=name, refs=refs) for name, refs in counts.items())
+    return counts
+
+
+def sweep(counts):
+    """Удаляет файлы без ссылок: старые имена и давние файлы по хешу."""
+    deadline = time.time() - ORPHAN_AGE
+    removed = 0
+    for name in list(media_files()):
+        if name in counts or (is_blob(name) and is_recent(name, deadline)):
+            continue
+        blob_storage.delete(name)
+        removed += 1
+    return removed
+
+
+def save_renamed(posts, dry_run=False):
+    if posts and not dry_run:
+        Post.objects.bulk_update(
+            posts, ['image', 'image_variants', 'thumbnail'])
+        bump(GLOBAL, *(post_tag(post.pk) for post in posts))
+    return len(posts)
+
+
+def dedup(dry_run=False):
+    """Перекладывает файлы картинок постов по хешу содержимого.
+
+    Сначала рядом появляются копии по хешу, затем посты переписываются
+    на новые имена, и только потом удаляются старые файлы, так что
+    прерванный перенос можно просто повторить. Заодно удаляются файлы,
+    на которые не ссылается ни один пост. Вернёт статистику.
+    """
+    legacy = [name for name in media_files() if not is_blob(name)]
+    if dry_run:
+        renamed = {name: blob_name(name, file_digest(blob_storage.path(name)))
+                   for name in legacy}
+    else:
+        renamed = {name: place(name) for name in legacy}
+    stats = {
+        'files': len(renamed),
+        'unique': len(set(renamed.values())),
+        'posts': 0,
+        'removed': 0,
+    }
+    posts = Post.objects.exclude(image='').only(
+        'image', 'image_variants', 'thumbnail')
+    changed = []
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        if rename_references(post, renamed):
+            changed.append(post)
+        if len(changed) >= BATCH_SIZE:
+            stats['posts'] += save_renamed(changed, dry_run)
+            changed = []
+    stats['posts'] += save_renamed(changed, dry_run)
+    if not dry_run:
+        stats['removed'] = sweep(recount())
+    return stats
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from yatube.metrics import record_cache
+from yatube.replicas import PRIMARY
+
+from .models import Post
+from .versions import bump, get_versions, is_recent, post_tag
+
+
+def card_key(post_id, version):
+    return f'post_card:{post_id}:{version}'
+
+
+def invalidate_card(post_id):
+    """Новая версия карточки: старый HTML больше никогда не читается."""
+    bump(post_tag(post_id))
+
+
+def invalidate_cards(posts):
+    """Сдвигает версии карточек всех постов выборки posts."""
+    post_ids = posts.values_list('pk', flat=True)
+    tags = [post_tag(post_id) for post_id in post_ids.iterator()]
+    if tags:
+        bump(*tags)
+
+
+def attach_cards(posts):
+    """Проставляет post.card — общий для всех зрителей HTML карточки.
+
+    Версии и готовые карточки страницы читаются двумя get_many,
+    рендерятся только отсутствующие в кеше. Части карточки, зависящие
+    от зрителя, post_item.html рисует отдельно.
+    """
+    posts = list(posts)
+    versions = get_versions([post_tag(post.pk) for post in posts])
+    keys = {
+        post.pk: card_key(post.pk, versions[post_tag(post.pk)])
+        for post in posts
+    }
+    cards = cache.get_many(keys.values())
+    record_cache(len(cards), len(keys) - len(cards))
+    # посты прочитаны до версий: с реплики мог прийти пост старше своей
+    # версии, и его карточка рендерится с основной базы
+    stale = [
+        post.pk for post in posts
+        if keys[post.pk] not in cards and post._state.db != PRIMARY
+        and is_recent(versions[post_tag(post.pk)])
+    ]
+    fresh = (Post.objects.using(PRIMARY).for_feed().in_bulk(stale)
+             if stale else {})
+    missing = {}
+    for post in posts:
+        card = cards.get(keys[post.pk])
+        if card is None:
+            card = render_to_string(
+                'post_card.html', {'post': fresh.get(post.pk, post)})
+            missing[keys[post.pk]] = card
+        post.card = mark_safe(card)
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+    return posts
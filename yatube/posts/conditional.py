@@ -0,0 +1,59 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from .versions import follow_tag, get_versions
+
+
+def validators(request, tags):
+    """ETag и Last-Modified страницы по версиям её тегов.
+
+    Версия — время последнего bump() в наносекундах, поэтому самая
+    свежая из них и есть время последнего изменения. В ETag входят
+    адрес и зритель: кнопки и отметки подписок у каждого свои.
+    """
+    versions = get_versions(tags)
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = '|'.join([request.get_full_path(), str(viewer)] + [
+        f'{tag}={versions[tag]}' for tag in sorted(versions)])
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    last_modified = max(int(version) for version in versions.values())
+    return etag, last_modified // 10 ** 9
+
+
+def conditional(tags_func):
+    """Условный GET для представления по версиям тегов.
+
+    tags_func(request, *args, **kwargs) возвращает теги страницы
+    дешёвым запросом или None, если страницы нет (тогда ответ
+    отдаёт само представление). При совпадении валидаторов клиент
+    получает 304 без основных запросов и без отрисовки шаблона.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            tags = tags_func(request, *args, **kwargs)
+            if tags is None:
+                return view(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                tags = [*tags, follow_tag(request.user.pk)]
+            etag, last_modified = validators(request, tags)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response['ETag'] = etag
+                    response['Last-Modified'] = http_date(last_modified)
+            # браузер переспрашивает сервер каждый раз, а 304 дёшев
+            patch_cache_control(response, no_cache=True,
+                                private=request.user.is_authenticated)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def count_subquery(queryset, field, outer='pk'):
+    """COUNT(*) строк queryset, где field равен outer внешнего запроса."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)}).order_by()
+            .values(field).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fix_drifted(queryset, field, actual):
+    """Исправляет строки, где field разошёлся с actual; вернёт их число."""
+    drifted = list(
+        queryset.annotate(actual=actual).exclude(**{field: F('actual')})
+        .values_list('pk', 'actual')
+    )
+    for pk, value in drifted:
+        queryset.filter(pk=pk).update(**{field: value})
+    return len(drifted)
+
+
+def rebuild_counters():
+    """Пересчитывает денормализованные счётчики, вернувшиеся в рассинхрон.
+
+    Возвращает словарь {счётчик: число исправленных строк}.
+    """
+    UserStats.objects.bulk_create(
+        UserStats(user=user)
+        for user in User.objects.filter(stats__isnull=True)
+    )
+    stats = UserStats.objects.all()
+    return {
+        'comments_count': fix_drifted(
+            Post.objects.all(), 'comments_count',
+            count_subquery(Comment.objects.all(), 'post')),
+        'posts_count': fix_drifted(
+            stats, 'posts_count',
+            count_subquery(Post.objects.all(), 'author', 'user')),
+        'followers_count': fix_drifted(
+            stats, 'followers_count',
+            count_subquery(Follow.objects.all(), 'author', 'user')),
+        'following_count': fix_drifted(
+            stats, 'following_count',
+            count_subquery(Follow.objects.all(), 'user', 'user')),
+    }
@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import FeedEntry, Follow, Post, UserStats
+from .paginators import CursorPaginator, keyset, row_key
+
+
+def is_pull_author(author_id):
+    """Автор, чьи посты не раскладываются по лентам, а подтягиваются."""
+    return UserStats.objects.filter(user_id=author_id, pull_mode=True).exists()
+
+
+def update_pull_mode(stats):
+    """Переключает pull-режим авторов выборки UserStats stats.
+
+    Режим включается с FEED_FANOUT_LIMIT подписчиков, а выключается
+    только ниже FEED_PULL_EXIT_LIMIT, чтобы автор у границы не скакал
+    туда и обратно. Посты, вышедшие в pull-режиме, по лентам так и не
+    раскладываются: момент выхода запоминается в pulled_until, и
+    FeedPaginator подтягивает посты автора до него.
+    """
+    stats.filter(
+        pull_mode=False, followers_count__gte=settings.FEED_FANOUT_LIMIT,
+    ).update(pull_mode=True)
+    stats.filter(
+        pull_mode=True, followers_count__lt=settings.FEED_PULL_EXIT_LIMIT,
+    ).update(pull_mode=False, pulled_until=timezone.now())
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """После подписки добавляет в ленту последние посты автора."""
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')[:settings.FEED_BACKFILL_LIMIT]
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def fill_feeds(follows):
+    """backfill() для всех подписок выборки follows одним INSERT ... SELECT.
+
+    Каждой подписке на автора не в pull-режиме достаются его последние
+    FEED_BACKFILL_LIMIT постов (ROW_NUMBER по автору: PostgreSQL или
+    SQLite 3.25+). Уже разложенные записи пропускаются, так что ленты
+    можно достраивать повторно. Вернёт число добавленных записей.
+    """
+    table = FeedEntry._meta.db_table
+    try:
+        follow_ids, params = follows.values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, post_id, pub_date) '
+            f'SELECT follow.user_id, recent.id, recent.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN {UserStats._meta.db_table} stats '
+            f'ON stats.user_id = follow.author_id AND stats.pull_mode = %s '
+            f'JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            f') AS position FROM {Post._meta.db_table} '
+            f'WHERE author_id IN (SELECT author_id '
+            f'FROM {Follow._meta.db_table} WHERE id IN ({follow_ids}))'
+            f') recent ON recent.author_id = follow.author_id '
+            f'AND recent.position <= %s '
+            f'WHERE follow.id IN ({follow_ids}) '
+            f'AND NOT EXISTS (SELECT 1 FROM {table} entry '
+            f'WHERE entry.user_id = follow.user_id '
+            f'AND entry.post_id = recent.id)',
+            [False, *params, settings.FEED_BACKFILL_LIMIT, *params])
+        return cursor.rowcount
+
+
+def prune(user_id, author_id):
+    """После отписки убирает посты автора из ленты."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорная пагинация ленты подписок по таблице FeedEntry.
+
+    Ключи страницы берутся одним проходом по индексу
+    (user, pub_date, post), посты популярных авторов (pull-режим, а
+    после выхода из него — посты до pulled_until) подтягиваются
+    отдельным запросом и сливаются по тому же ключу.
+    Сами посты страницы читаются из posts (по умолчанию for_feed()).
+    """
+
+    def __init__(self, object_list, per_page, user=None, posts=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.user = user
+        self.posts = Post.objects.for_feed() if posts is None else posts
+
+    def fetch(self, key, forward):
+        limit = self.per_page + 1
+        sign = '-' if forward else ''
+        entry_order = (f'{sign}pub_date', f'{sign}post_id')
+        post_order = (f'{sign}pub_date', f'{sign}id')
+
+        entries = FeedEntry.objects.filter(user=self.user)
+        if key is not None:
+            entries = entries.filter(keyset(*key, forward, id_field='post'))
+        keys = set(entries.order_by(*entry_order).values_list(
+            'pub_date', 'post')[:limit])
+
+        pull_authors = Follow.objects.filter(user=self.user).filter(
+            Q(author__stats__pull_mode=True)
+            | Q(author__stats__pulled_until__isnull=False),
+        ).values_list('author', 'author__stats__pull_mode',
+                      'author__stats__pulled_until')
+        pulled_posts = Q()
+        for author_id, pull_mode, pulled_until in pull_authors:
+            if pull_mode:
+                pulled_posts |= Q(author_id=author_id)
+            else:
+                pulled_posts |= Q(author_id=author_id,
+                                  pub_date__lte=pulled_until)
+        # обычно таких авторов нет, и запрос к постам не нужен вовсе
+        if pulled_posts:
+            pulled = Post.objects.filter(pulled_posts)
+            if key is not None:
+                pulled = pulled.filter(keyset(*key, forward))
+            keys.update(pulled.order_by(*post_order).values_list(
+                'pub_date', 'pk')[:limit])
+        keys = sorted(keys, reverse=forward)[:limit]
+
+        posts = {
+            row_key(post)[1]: post for post in self.posts.filter(
+                pk__in=[pk for _, pk in keys]).order_by()
+        }
+        return [posts[pk] for _, pk in keys if pk in posts]
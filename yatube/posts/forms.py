@@ -1,6 +1,10 @@
+import json
+
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
 
+from . import images
 from .models import Comment, Post
 
 
@@ -15,6 +19,24 @@ class PostForm(forms.ModelForm):
             'image': _('Загрузить картинку:'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            self.decoded_image = images.check(image)
+        return image
+
+    def save(self, commit=True):
+        # загрузка заменяется перекодированными вариантами ещё до сохранения
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            variants = images.process(image, self.decoded_image)
+            self.instance.image = images.main_image(variants)
+            self.instance.image_width = variants['width']
+            self.instance.image_height = variants['height']
+            self.instance.image_placeholder = variants.pop('placeholder')
+            self.instance.image_variants = json.dumps(variants)
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,197 @@
+import os
+from base64 import b64encode
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+from .storage import blob_storage
+
+# Картинки постов при загрузке: проверка размеров, перекодирование
+# без метаданных и набор ширин для srcset. Описание вариантов хранится
+# в Post.image_variants, а Post.image указывает на самый широкий JPEG,
+# так что API, выгрузка и /img/ работают с ним как с обычной картинкой.
+
+# имя -> (формат Pillow, MIME-тип, расширение файла)
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', 'avif'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+# JPEG понимают все браузеры, он строится всегда
+FALLBACK = 'jpeg'
+UPLOAD_DIR = 'posts'
+# заглушка пока грузится картинка: столько точек по длинной стороне,
+# браузер растягивает её с размытием
+PLACEHOLDER_SIDE = 16
+PLACEHOLDER_QUALITY = 50
+# EXIF Orientation, при 5-8 ширина и высота меняются местами
+ORIENTATION = 0x0112
+
+
+def formats():
+    """Форматы из IMAGE_FORMATS, которые умеет кодировать Pillow, и JPEG."""
+    Image.init()
+    names = [name for name in settings.IMAGE_FORMATS
+             if name != FALLBACK and FORMATS[name][0] in Image.SAVE]
+    return names + [FALLBACK]
+
+
+def widths(width):
+    """Ширины вариантов: из IMAGE_WIDTHS, без увеличения картинки."""
+    result = [value for value in settings.IMAGE_WIDTHS if value < width]
+    if width <= max(settings.IMAGE_WIDTHS):
+        result.append(width)
+    return result
+
+
+def check(upload):
+    """Отклоняет слишком большой файл, картинку или битые данные.
+
+    Размеры проверяются по заголовку, до декодирования пикселей; вернёт
+    декодированную картинку для process(), чтобы не читать её дважды.
+    """
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s',
+            params={'limit': filesizeformat(settings.IMAGE_MAX_UPLOAD_SIZE)},
+            code='file_too_large')
+    upload.seek(0)
+    with Image.open(upload) as image:
+        width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)s×%(height)s слишком большая',
+            params={'width': width, 'height': height},
+            code='image_too_large')
+    try:
+        return open_image(upload, max(settings.IMAGE_WIDTHS))
+    except (OSError, SyntaxError, ValueError):
+        # например, обрезанный JPEG: заголовок цел, данных не хватает
+        raise ValidationError('Картинка повреждена и не читается',
+                              code='broken_image')
+
+
+def open_image(file, side):
+    """Картинка с учётом EXIF-поворота, в RGB или RGBA.
+
+    У JPEG декодер сразу уменьшает картинку (draft), но не меньше чем
+    до side по каждой стороне: в памяти не оказывается полный снимок,
+    а поворот по EXIF не делает её уже нужного.
+    """
+    file.seek(0)
+    with Image.open(file) as source:
+        source.draft(None, (side, side))
+        image = ImageOps.exif_transpose(source)
+    if image.mode not in ('RGB', 'RGBA'):
+        transparent = (image.mode in ('LA', 'PA')
+                       or 'transparency' in image.info)
+        image = image.convert('RGBA' if transparent else 'RGB')
+    return image
+
+
+def dimensions(file):
+    """Ширина и высота с учётом EXIF-поворота, только по заголовку."""
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        if image.getexif().get(ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+    return width, height
+
+
+def placeholder(image):
+    """data: URI крошечной копии картинки для фона, пока она грузится.
+
+    Усреднение блоков (Image.BOX) Pillow считает на C сразу по всем
+    точкам, так что даже большая картинка уменьшается за миллисекунды.
+    WebP такого размера на порядок меньше JPEG, если Pillow его умеет.
+    """
+    scale = PLACEHOLDER_SIDE / max(image.size)
+    size = (max(1, round(image.width * scale)),
+            max(1, round(image.height * scale)))
+    preview = flatten(image.resize(size, Image.BOX))
+    name = 'webp' if 'webp' in formats() else FALLBACK
+    buffer = BytesIO()
+    preview.save(buffer, FORMATS[name][0], quality=PLACEHOLDER_QUALITY)
+    data = b64encode(buffer.getvalue()).decode()
+    return f'data:{FORMATS[name][1]};base64,{data}'
+
+
+def preview(file):
+    """(ширина, высота, заглушка) картинки в файле file.
+
+    Декодируется только уменьшенная копия: заглушке хватает draft.
+    """
+    width, height = dimensions(file)
+    return width, height, placeholder(open_image(file, PLACEHOLDER_SIDE))
+
+
+def flatten(image):
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def encode(image, name):
+    """Байты картинки в формате name; EXIF и прочие метаданные не пишутся.
+
+    Остаётся только цветовой профиль, без него исказятся цвета.
+    """
+    pillow_format = FORMATS[name][0]
+    options = {'quality': settings.IMAGE_QUALITY}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if name == FALLBACK:
+        image = flatten(image)
+        options.update(optimize=True, progressive=True)
+    buffer = BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def process(upload, image=None):
+    """Сохраняет варианты загруженной картинки; вернёт их описание.
+
+    {'width', 'height', 'sources': {формат: [[ширина, имя файла]...]},
+    'original', 'placeholder'}: размеры — самого широкого варианта,
+    original заполнен только при IMAGE_KEEP_ORIGINAL. image — уже
+    декодированная check() картинка.
+    """
+    if image is None:
+        image = open_image(upload, max(settings.IMAGE_WIDTHS))
+    sources = {name: [] for name in formats()}
+    for width in widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = (image if width == image.width
+                   else image.resize((width, height), Image.LANCZOS))
+        for name, files in sources.items():
+            # имя файла — хеш содержимого, повторная загрузка той же
+            # картинки новых файлов не создаёт
+            filename = blob_storage.save(
+                f'{UPLOAD_DIR}/{width}.{FORMATS[name][2]}',
+                ContentFile(encode(resized, name)))
+            files.append([width, filename])
+    original = None
+    if settings.IMAGE_KEEP_ORIGINAL:
+        upload.seek(0)
+        extension = os.path.splitext(upload.name)[1].lower()
+        original = blob_storage.save(
+            f'{UPLOAD_DIR}/original{extension}', upload)
+    return {
+        'width': width,
+        'height': height,
+        'sources': sources,
+        'original': original,
+        'placeholder': placeholder(image),
+    }
+
+
+def main_image(variants):
+    """Самый широкий вариант в JPEG: он и становится Post.image."""
+    return variants['sources'][FALLBACK][-1][1]
@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts.images import preview
+from posts.models import Post
+from posts.versions import bump, post_feed_tags, post_tag
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет размеры и заглушки картинок постов, где их ещё нет'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(
+            image__isnull=True).filter(image_placeholder='').only(
+            'image', 'author_id', 'group_id')
+        done = 0
+        for post in posts.iterator():
+            try:
+                with default_storage.open(post.image.name) as file:
+                    width, height, placeholder = preview(file)
+            except Exception as error:
+                self.stderr.write(f'Пост {post.pk}: {error}')
+                continue
+            # картинку могли заменить вместе с размерами, пока читали файл
+            updated = Post.objects.filter(
+                pk=post.pk, image=post.image.name).update(
+                image_width=width, image_height=height,
+                image_placeholder=placeholder)
+            if not updated:
+                continue
+            # update() без сигналов, поэтому карточку и ленты (в ответах
+            # API тоже есть размеры) сбрасываем сами
+            bump(post_tag(post.pk), *post_feed_tags(post.author_id,
+                                                    post.group_id))
+            done += 1
+        self.stdout.write(f'Готово заглушек: {done}')
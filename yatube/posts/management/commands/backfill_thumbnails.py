@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='перестроить и уже готовые миниатюры')
+
+    def handle(self, *args, **options):
+        # у картинок с вариантами (posts/images.py) миниатюры не нужны
+        posts = Post.objects.exclude(image='').exclude(
+            image__isnull=True).filter(image_variants='')
+        if not options['all']:
+            posts = posts.filter(thumbnail='')
+        built = 0
+        for pk in posts.values_list('pk', flat=True).iterator():
+            try:
+                generate(pk)
+            except Exception as error:
+                self.stderr.write(f'Пост {pk}: {error}')
+            else:
+                built += 1
+        self.stdout.write(f'Построено миниатюр: {built}')
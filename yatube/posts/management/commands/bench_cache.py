@@ -0,0 +1,89 @@
+import statistics
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+TABLE = 'yatube_bench_cache'
+
+
+def backends(directory):
+    locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    file = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': directory,
+    }
+    db = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': TABLE,
+    }
+
+    def two_tier(shared):
+        return {
+            'default': {
+                'BACKEND': 'yatube.cache.TwoTierCache',
+                'LOCATION': 'shared',
+                'OPTIONS': {'IMMUTABLE_PREFIXES': ['bench:']},
+            },
+            'shared': shared,
+        }
+
+    return {
+        'locmem': {'default': locmem},
+        'file': {'default': file},
+        'db': {'default': db},
+        'two-tier/file': two_tier(file),
+        'two-tier/db': two_tier(db),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержку попаданий в кеш для разных уровней'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=200)
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--size', type=int, default=2048,
+                            help='размер значения в байтах')
+
+    def handle(self, *args, **options):
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                configs = backends(directory)
+                with override_settings(CACHES=configs['db']):
+                    call_command('createcachetable', verbosity=0)
+                for name, config in configs.items():
+                    with override_settings(CACHES=config):
+                        self.report(name, self.measure(caches['default'],
+                                                       **options))
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS '
+                               f'{connection.ops.quote_name(TABLE)}')
+
+    def measure(self, cache, keys, rounds, size, **options):
+        value = 'x' * size
+        names = [f'bench:{number}' for number in range(keys)]
+        cache.set_many({name: value for name in names}, None)
+        timings = []
+        for _ in range(rounds):
+            for name in names:
+                started = time.perf_counter()
+                cache.get(name)
+                timings.append(time.perf_counter() - started)
+        cache.clear()
+        return timings
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{name:<15} '
+            f'mean {statistics.mean(timings) * 1e6:8.1f} мкс  '
+            f'p50 {statistics.median(timings) * 1e6:8.1f} мкс  '
+            f'p95 {p95 * 1e6:8.1f} мкс'
+        )
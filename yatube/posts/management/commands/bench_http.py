@@ -0,0 +1,107 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from posts.benchmark import (MIXES, ClientTransport, Sample, ServerTransport,
+                             parse_mix, regressions, run, summarize)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон страниц постов: задержки p50/p95/p99, '
+            'запросы в секунду и число SQL-запросов по именам URL. '
+            'Наборы с add_comment пишут в базу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mix', default='mixed',
+                            help=f'{", ".join(MIXES)} или '
+                                 f'"index=40,follow_index@user=20"')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--warmup', type=int, default=50,
+                            help='запросы до замера, в отчёт не входят')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--server',
+                            help='адрес запущенного сервера; без него '
+                                 'запросы идут через тестовый клиент')
+        parser.add_argument('--output', help='файл для отчёта в JSON')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--tolerance', type=float, default=20,
+                            help='допустимый рост p95 и SQL, проценты')
+
+    def handle(self, *args, **options):
+        try:
+            sample = Sample(options['seed'])
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        requests = list(sample.plan(
+            mix, options['warmup'] + options['requests']))
+        if options['server']:
+            transport = ServerTransport(options['server'])
+            summary = self.measure(transport, requests, options)
+        else:
+            # как в продакшене: без DEBUG и debug_toolbar
+            with override_settings(
+                    DEBUG=False,
+                    ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver']):
+                summary = self.measure(ClientTransport(), requests, options)
+        self.report(summary)
+
+        result = {
+            'commit': git_commit(),
+            'created': timezone.now().isoformat(),
+            'options': {key: options[key] for key in (
+                'mix', 'requests', 'concurrency', 'seed', 'server')},
+            'results': summary,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['results']
+            worse = regressions(summary, baseline, options['tolerance'])
+            if worse:
+                raise CommandError('Регрессия: ' + '; '.join(worse))
+
+    def measure(self, transport, requests, options):
+        warmup = options['warmup']
+        run(transport, requests[:warmup], options['concurrency'])
+        results, elapsed = run(
+            transport, requests[warmup:], options['concurrency'])
+        summary = summarize(results, elapsed)
+        summary['total'] = {
+            'requests': len(results),
+            'rps': round(len(results) / elapsed, 2),
+        }
+        return summary
+
+    def report(self, summary):
+        self.stdout.write(
+            f'{"URL":<14}{"запросов":>9}{"ошибок":>8}{"rps":>9}'
+            f'{"p50":>9}{"p95":>9}{"p99":>9}{"SQL":>7}')
+        for name, row in summary.items():
+            if name == 'total':
+                continue
+            queries = '-' if row['queries'] is None else row['queries']
+            self.stdout.write(
+                f'{name:<14}{row["requests"]:>9}{row["errors"]:>8}'
+                f'{row["rps"]:>9}{row["p50_ms"]:>9}{row["p95_ms"]:>9}'
+                f'{row["p99_ms"]:>9}{queries:>7}')
+        total = summary['total']
+        self.stdout.write(
+            f'Всего: {total["requests"]} запросов, {total["rps"]} в секунду')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.blobs import dedup
+
+
+class Command(BaseCommand):
+    help = ('Перекладывает картинки постов в MEDIA_ROOT по хешу содержимого, '
+            'пересчитывает ссылки на файлы и удаляет файлы без ссылок')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только посчитать, ничего не меняя')
+
+    def handle(self, *args, **options):
+        stats = dedup(options['dry_run'])
+        self.stdout.write(
+            f'Файлов со старыми именами: {stats["files"]}, '
+            f'различных: {stats["unique"]}')
+        self.stdout.write(f'Постов переписано: {stats["posts"]}')
+        self.stdout.write(f'Удалено файлов: {stats["removed"]}')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import CHUNK_SIZE, TransferError, export_to, open_stream
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и подписки '
+            'потоком JSONL (.gz и .zst сжимаются)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='файл выгрузки, по умолчанию stdout')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        # в stdout может идти сама выгрузка, тогда без сообщений
+        quiet = options['path'] == '-'
+        started = time.monotonic()
+        try:
+            with open_stream(options['path'], 'w') as stream:
+                counts = export_to(
+                    stream, options['chunk_size'],
+                    (lambda kind, count: None) if quiet else self.report)
+        except TransferError as error:
+            raise CommandError(error)
+        if quiet:
+            return
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(f'Готово за {time.monotonic() - started:.1f} с')
+
+    def report(self, kind, count):
+        self.stdout.write(f'{kind}: {count}')
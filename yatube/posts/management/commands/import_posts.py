@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import BATCH_SIZE, TransferError, import_from, open_stream
+
+
+class Command(BaseCommand):
+    help = ('Загружает выгрузку export_posts пачками bulk_create; '
+            'уже существующие записи пропускаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='файл выгрузки, по умолчанию stdin')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with open_stream(options['path'], 'r') as stream:
+                counts = import_from(stream, options['batch_size'],
+                                     self.report)
+        except TransferError as error:
+            raise CommandError(error)
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write('Миниатюры картинок: manage.py backfill_thumbnails')
+        self.stdout.write(f'Готово за {time.monotonic() - started:.1f} с')
+
+    def report(self, kind, count):
+        self.stdout.write(f'{kind}: +{count}')
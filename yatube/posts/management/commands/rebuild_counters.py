@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def handle(self, *args, **options):
+        for counter, fixed in rebuild_counters().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
@@ -0,0 +1,73 @@
+import os
+import time
+from argparse import ArgumentTypeError
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.seed import EPOCH, seed_database
+
+
+def moment(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ArgumentTypeError(f'не дата и время ISO 8601: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, подписками, '
+            'постами и комментариями для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments-per-post', type=float, default=3,
+                            help='среднее число комментариев к посту')
+        parser.add_argument('--image-ratio', type=float, default=0.2,
+                            help='доля постов с картинкой')
+        parser.add_argument('--days', type=int, default=365,
+                            help='за сколько дней распределены посты')
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help='показатель Ципфа для популярности авторов')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--now', type=moment, default=EPOCH,
+                            help='от какого момента отсчитываются даты, '
+                                 'например 2026-01-01T00:00')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int,
+                            default=min(os.cpu_count() or 1, 8))
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write('SQLite пишет в один поток: --workers=1')
+            workers = 1
+        started = time.monotonic()
+        result = seed_database(
+            users=options['users'],
+            posts=options['posts'],
+            follows_per_user=options['follows_per_user'],
+            groups=options['groups'],
+            comments_per_post=options['comments_per_post'],
+            image_ratio=options['image_ratio'],
+            days=options['days'],
+            skew=options['skew'],
+            seed=options['seed'],
+            now=options['now'],
+            chunk_size=options['chunk_size'],
+            workers=workers,
+            report=self.report,
+        )
+        for name, count in result.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(f'Готово за {time.monotonic() - started:.1f} с')
+
+    def report(self, kind, count):
+        self.stdout.write(f'{kind}: +{count}')
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    comments = Comment.objects.filter(post__isnull=False).values(
+        'post').annotate(count=Count('pk')).order_by()
+    for row in comments:
+        Post.objects.filter(pk=row['post']).update(
+            comments_count=row['count'])
+
+    stats = {
+        pk: UserStats(user_id=pk)
+        for pk in User.objects.values_list('pk', flat=True)
+    }
+    counters = (
+        (Post, 'author', 'posts_count'),
+        (Follow, 'author', 'followers_count'),
+        (Follow, 'user', 'following_count'),
+    )
+    for model, field, counter in counters:
+        rows = model.objects.values(field).annotate(
+            count=Count('pk')).order_by()
+        for row in rows:
+            setattr(stats[row[field]], counter, row['count'])
+    UserStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_auto_20210704_1501'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
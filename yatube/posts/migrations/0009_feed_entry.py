@@ -0,0 +1,56 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+def fill_feeds(apps, schema_editor):
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    # посты популярных авторов лента подтягивает при чтении (pull-режим)
+    pull_authors = UserStats.objects.filter(
+        followers_count__gte=settings.FEED_FANOUT_LIMIT).values('user_id')
+    follows = Follow.objects.exclude(author_id__in=pull_authors)
+    for user_id, author_id in follows.values_list(
+            'user_id', 'author_id').iterator():
+        posts = Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-pk').values_list(
+            'pk', 'pub_date')[:settings.FEED_BACKFILL_LIMIT]
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+             for pk, pub_date in posts),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='feed_entry_timeline'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
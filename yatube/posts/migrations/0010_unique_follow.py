@@ -0,0 +1,45 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:31
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        keep=Min('pk'), count=Count('pk')).filter(count__gt=1).order_by()
+    affected = set()
+    for row in duplicates:
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(pk=row['keep']).delete()
+        affected.update((row['user'], row['author']))
+
+    # удаление в миграции не вызывает сигналы, поправляем счётчики сами
+    for user_id in affected:
+        UserStats.objects.filter(user_id=user_id).update(
+            followers_count=Follow.objects.filter(author=user_id).count(),
+            following_count=Follow.objects.filter(user=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_feed_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+from posts.stemmer import stem_text
+
+FTS_TABLE = 'posts_post_fts'
+PG_TABLE = 'posts_post_search'
+
+
+def create_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+                f"body, tokenize='unicode61 remove_diacritics 2')")
+            for pk, text in Post.objects.values_list(
+                    'pk', 'text').iterator():
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                    [pk, stem_text(text)])
+        elif vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE TABLE {PG_TABLE} ('
+                f'post_id integer PRIMARY KEY REFERENCES posts_post (id) '
+                f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                f'document tsvector NOT NULL)')
+            cursor.execute(
+                f'CREATE INDEX {PG_TABLE}_document '
+                f'ON {PG_TABLE} USING GIN (document)')
+            cursor.execute(
+                f'INSERT INTO {PG_TABLE} (post_id, document) '
+                f"SELECT id, to_tsvector('russian', text) FROM posts_post")
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    table = {'sqlite': FTS_TABLE, 'postgresql': PG_TABLE}.get(vendor)
+    if table is not None:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pull_authors(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.FEED_FANOUT_LIMIT,
+    ).update(pull_mode=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pull_mode',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='pulled_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_pull_authors, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,25 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.functional import cached_property
+
+from .storage import blob_storage
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Посты с автором и группой за один запрос.
+
+        Число комментариев хранится в самом посте (comments_count),
+        поэтому карточке ленты дополнительные запросы не нужны.
+        """
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(
@@ -16,14 +32,40 @@ class Post(models.Model):
         'Group', on_delete=models.SET_NULL, blank=True,
         null=True, related_name='posts'
     )
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # файлы хранятся по хешу содержимого, см. ImageBlob
+    image = models.ImageField(upload_to='posts/', storage=blob_storage,
+                              blank=True, null=True)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # адрес готовой миниатюры, строится в фоне (posts/thumbnails.py)
+    thumbnail = models.CharField(max_length=255, blank=True, editable=False)
+    # JSON с вариантами загруженной картинки (posts/images.py)
+    image_variants = models.TextField(blank=True, default='', editable=False)
+    # размеры и заглушка картинки: карточка занимает место сразу
+    image_width = models.PositiveIntegerField(
+        blank=True, null=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        blank=True, null=True, editable=False)
+    image_placeholder = models.TextField(
+        blank=True, default='', editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @cached_property
+    def variants(self):
+        return json.loads(self.image_variants) if self.image_variants else {}
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -46,13 +88,92 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField('date published', auto_now_add=True)
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created'),
+        ]
+
     def __str__(self):
         return self.text
 
 
+class FollowQuerySet(models.QuerySet):
+
+    def followed_authors(self, user, author_ids):
+        """Те из author_ids, на кого подписан user, — одним запросом."""
+        if not user.is_authenticated:
+            return set()
+        return set(self.filter(
+            user=user, author_id__in=set(author_ids)
+        ).values_list('author_id', flat=True))
+
+
 class Follow(models.Model):
     # только так, иначе flake ругается
     user = models.ForeignKey(User, on_delete=models.CASCADE,
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')
+
+    objects = FollowQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Материализованная лента подписок: пост в ленте пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    # копия post.pub_date, чтобы лента читалась одним проходом по индексу
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_entry_timeline'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляются сигналами из signals.py."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # посты автора подтягиваются в ленты при чтении (posts/feed.py)
+    pull_mode = models.BooleanField(default=False)
+    # до этого момента посты автора по лентам не раскладывались
+    pulled_until = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+
+class ImageBlob(models.Model):
+    """Файл картинки по хешу и число постов, которые на него ссылаются.
+
+    Ведётся сигналами (posts/blobs.py); файл удаляется вместе с
+    последней ссылкой.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.refs}'
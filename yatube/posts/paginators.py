@@ -0,0 +1,265 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from yatube.metrics import record_cache
+
+from .versions import versioned_key
+
+NEXT = 'n'
+PREVIOUS = 'p'
+ELLIPSIS = '…'
+
+
+def row_key(obj, date_field='pub_date'):
+    """Ключ (дата, id) модели или словаря из values()."""
+    if isinstance(obj, dict):
+        return obj[date_field], obj['id']
+    return getattr(obj, date_field), obj.pk
+
+
+def encode_cursor(direction, obj, date_field='pub_date'):
+    """Упаковывает ключ (дата, id) записи в непрозрачный токен."""
+    date, pk = row_key(obj, date_field)
+    raw = f'{direction}|{date.isoformat()}|{pk}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(cursor):
+    """Возвращает (direction, pub_date, id) или None для битого токена."""
+    try:
+        direction, pub_date, pk = (
+            urlsafe_base64_decode(cursor).decode().split('|'))
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def keyset(pub_date, pk, forward, date_field='pub_date', id_field='id'):
+    """Условие «строго после ключа (pub_date, pk)».
+
+    forward=True — в сторону старых записей, как идёт лента постов.
+    """
+    op = 'lt' if forward else 'gt'
+    return (
+        Q(**{f'{date_field}__{op}': pub_date})
+        | Q(**{date_field: pub_date, f'{id_field}__{op}': pk})
+    )
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по статистике планировщика или None.
+
+    Есть только у PostgreSQL: EXPLAIN не читает таблицу, а берёт
+    число строк из статистики, которую собирает ANALYZE.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def elided_page_range(paginator, number, on_each_side=2, on_ends=1):
+    """Номера страниц: края и окно вокруг текущей, пропуски — ELLIPSIS."""
+    num_pages = paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        yield from range(1, num_pages + 1)
+        return
+    if number > on_each_side + on_ends + 1:
+        yield from range(1, on_ends + 1)
+        yield ELLIPSIS
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield ELLIPSIS
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
+
+
+class NumberedPaginator(Paginator):
+    """Номерная пагинация с ограниченной стоимостью.
+
+    Пока записей меньше PAGINATOR_COUNT_THRESHOLD, COUNT(*) честный.
+    Больше — число берётся из оценки планировщика (estimate_count)
+    или считается один раз и кешируется на PAGINATOR_COUNT_TIMEOUT.
+    Номера страниц не больше PAGINATOR_MAX_PAGES: глубокие ?page=
+    сводятся к последней допустимой, и OFFSET остаётся ограниченным.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        key = self.count_key(queryset)
+        count = cache.get(key)
+        record_cache(count is not None, count is None)
+        if count is not None:
+            return count
+        count = estimate_count(queryset)
+        if count is None or count < settings.PAGINATOR_COUNT_THRESHOLD:
+            count = super().count
+        if count >= settings.PAGINATOR_COUNT_THRESHOLD:
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+    @cached_property
+    def num_pages(self):
+        return min(super().num_pages, settings.PAGINATOR_MAX_PAGES)
+
+    @staticmethod
+    def count_key(queryset):
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+        return f'page_count:{digest}'
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (date_field, id) без COUNT(*) и OFFSET.
+
+    Стоимость любой страницы одинакова: один запрос по индексу
+    pub_date (в SQLite он неявно содержит id) с LIMIT per_page + 1.
+    Номера страниц здесь условные: текущая страница — 1 или 2,
+    в зависимости от наличия предыдущей, а num_pages на единицу больше
+    при наличии следующей, поэтому методы Page работают как обычно.
+    """
+
+    cursor_mode = True
+    date_field = 'pub_date'
+    # лента идёт от новых записей к старым, как посты
+    oldest_first = False
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def get_page(self, cursor=None):
+        key = decode_cursor(cursor) if cursor else None
+        if key is None:
+            posts, has_previous, has_next = self._first()
+        elif key[0] == NEXT:
+            posts, has_next = self._slice(self.fetch(key[1:], True))
+            has_previous = True
+        else:
+            posts, has_previous, has_next = self._before(key[1:])
+        if posts and has_next:
+            self.next_cursor = encode_cursor(
+                NEXT, posts[-1], self.date_field)
+        if posts and has_previous:
+            self.previous_cursor = encode_cursor(
+                PREVIOUS, posts[0], self.date_field)
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        return Page(posts, number, self)
+
+    def fetch(self, key, forward):
+        """Не более per_page + 1 записей после ключа key (None — с начала)."""
+        queryset = self.object_list
+        descending = forward != self.oldest_first
+        if key is not None:
+            queryset = queryset.filter(
+                keyset(*key, descending, date_field=self.date_field))
+        sign = '-' if descending else ''
+        return list(queryset.order_by(
+            f'{sign}{self.date_field}', f'{sign}id')[:self.per_page + 1])
+
+    def _slice(self, posts):
+        return posts[:self.per_page], len(posts) > self.per_page
+
+    def _first(self):
+        posts, has_next = self._slice(self.fetch(None, True))
+        return posts, False, has_next
+
+    def _before(self, key):
+        posts, has_previous = self._slice(self.fetch(key, False))
+        posts.reverse()
+        if not has_previous:
+            # Вернулись к началу ленты: отдаём полную первую страницу.
+            return self._first()
+        return posts, has_previous, True
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии по (created, id) от старых к новым.
+
+    Страница читается по индексу (post, created), так что её
+    стоимость не зависит от длины обсуждения.
+    """
+
+    date_field = 'created'
+    oldest_first = True
+
+
+def page_state(page):
+    """Всё, что нужно для восстановления страницы без запросов к БД."""
+    paginator = page.paginator
+    state = {
+        'posts': list(page),
+        'number': page.number,
+        'per_page': paginator.per_page,
+        'num_pages': paginator.num_pages,
+    }
+    if getattr(paginator, 'cursor_mode', False):
+        state['next_cursor'] = paginator.next_cursor
+        state['previous_cursor'] = paginator.previous_cursor
+    else:
+        state['count'] = paginator.count
+    return state
+
+
+def restore_page(state, object_list):
+    if 'count' in state:
+        paginator = NumberedPaginator(object_list, state['per_page'])
+        paginator.count = state['count']
+    else:
+        paginator = CursorPaginator(object_list, state['per_page'])
+        paginator.next_cursor = state['next_cursor']
+        paginator.previous_cursor = state['previous_cursor']
+    paginator.num_pages = state['num_pages']
+    return Page(state['posts'], state['number'], paginator)
+
+
+def paginate(request, object_list, per_page,
+             paginator_class=CursorPaginator, tags=(), **kwargs):
+    """Страница ленты: по ?cursor=, либо по номеру ?page= для старых ссылок.
+
+    Без параметров отдаётся первая страница keyset-пагинации,
+    номерная пагинация по object_list остаётся только для ссылок ?page=N.
+    С tags страница кешируется под ключом из версий этих тегов.
+    """
+    if tags:
+        key = versioned_key('feed_page', tags, request.get_full_path())
+        state = cache.get(key)
+        record_cache(state is not None, state is None)
+        if state is not None:
+            return restore_page(state, object_list)
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        page = NumberedPaginator(object_list, per_page).get_page(page_number)
+    else:
+        paginator = paginator_class(object_list, per_page, **kwargs)
+        page = paginator.get_page(request.GET.get('cursor'))
+    if tags:
+        cache.set(key, page_state(page), settings.FEED_PAGE_TIMEOUT)
+    return page
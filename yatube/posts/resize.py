@@ -0,0 +1,230 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+from PIL import Image, ImageOps
+
+from . import images
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Картинки нужного размера по запросу: /img/<параметры>:<подпись>/<путь>.
+# Подпись покрывает и параметры, и путь, так что набор размеров задаёт
+# только код сайта (resize_url), а не тот, кто перебирает адреса.
+# Готовые файлы лежат в IMAGE_CACHE_DIR под хешем исходных данных,
+# и адрес варианта не меняется, пока не изменится исходный файл.
+SALT = 'posts.resize'
+SPEC = re.compile(r'^(\d+)x(\d+)(c?)\.(\w+)$')
+ALLOWED_PREFIX = 'posts/'
+# год: адрес с подписью неизменен, как и сам вариант
+MAX_AGE = 60 * 60 * 24 * 365
+# чтение обновляет mtime файла (порядок вытеснения) не чаще раза в час
+TOUCH_INTERVAL = 60 * 60
+# доля IMAGE_CACHE_MAX_SIZE, до которой кеш очищается при переполнении
+EVICT_TO = 0.9
+LOCK_STRIPES = 256
+LOCKS_DIR = 'locks'
+
+Spec = namedtuple('Spec', 'width height crop format')
+# без fcntl (Windows) варианты строятся под блокировками этого процесса
+_thread_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+# примерный объём кеша, известный этому процессу; None — не считан
+_usage = {'bytes': None}
+_usage_lock = threading.Lock()
+
+
+def spec_string(spec):
+    crop = 'c' if spec.crop else ''
+    return f'{spec.width}x{spec.height}{crop}.{spec.format}'
+
+
+def signature(spec, path):
+    return signing.Signer(salt=SALT).signature(f'{spec_string(spec)}/{path}')
+
+
+def resize_url(path, width, height=0, crop=False, format='jpeg'):
+    """Подписанный адрес картинки path шириной width.
+
+    С crop картинка обрезается по центру ровно до width×height,
+    без него вписывается в эти размеры (height=0 — по ширине).
+    """
+    spec = Spec(width, height, crop, format)
+    signed = f'{spec_string(spec)}:{signature(spec, path)}'
+    return reverse('resize', args=[signed, path])
+
+
+def parse(signed, path):
+    """Spec из подписанных параметров; любая ошибка — 404."""
+    value, _, sign = signed.rpartition(':')
+    match = SPEC.match(value)
+    if not match or not path.startswith(ALLOWED_PREFIX) or '..' in path:
+        raise Http404
+    width, height, crop, format = match.groups()
+    spec = Spec(int(width), int(height), bool(crop), format)
+    if not constant_time_compare(sign, signature(spec, path)):
+        raise Http404
+    limit = settings.IMAGE_RESIZE_MAX_SIDE
+    if (not 0 < spec.width <= limit or spec.height > limit
+            or (spec.crop and not spec.height)
+            or spec.format not in images.formats()):
+        raise Http404
+    return spec
+
+
+def cache_path(spec, path):
+    """Файл варианта в кеше: хеш параметров и версии исходного файла."""
+    try:
+        version = (default_storage.size(path),
+                   default_storage.get_modified_time(path).timestamp())
+    except (OSError, ValueError):
+        raise Http404
+    key = hashlib.sha256(
+        f'{spec_string(spec)}|{path}|{version}'.encode()).hexdigest()
+    extension = images.FORMATS[spec.format][2]
+    return key, os.path.join(settings.IMAGE_CACHE_DIR, key[:2], key[2:4],
+                             f'{key}.{extension}')
+
+
+@contextmanager
+def key_lock(key):
+    """Блокировка варианта на все потоки и процессы, у кого есть fcntl.
+
+    Блокировки общие на полосу ключей, так что файлов блокировок не
+    больше LOCK_STRIPES, а их удаление не нужно.
+    """
+    stripe = int(key[:2], 16) % LOCK_STRIPES
+    if fcntl is None:
+        with _thread_locks[stripe]:
+            yield
+        return
+    directory = os.path.join(settings.IMAGE_CACHE_DIR, LOCKS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{stripe:02x}.lock'), 'w') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def render(spec, path):
+    with default_storage.open(path) as file:
+        image = images.open_image(file, max(spec.width, spec.height))
+    if spec.crop:
+        image = ImageOps.fit(image, (spec.width, spec.height), Image.LANCZOS)
+    else:
+        # thumbnail только уменьшает, больше исходной картинка не станет
+        image.thumbnail((spec.width, spec.height or image.height),
+                        Image.LANCZOS)
+    return images.encode(image, spec.format)
+
+
+def cached_files():
+    for root, directories, files in os.walk(settings.IMAGE_CACHE_DIR):
+        if LOCKS_DIR in directories:
+            directories.remove(LOCKS_DIR)
+        for name in files:
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def evict():
+    """Удаляет давно не читанные варианты, пока кеш больше EVICT_TO.
+
+    Вернёт объём оставшихся файлов.
+    """
+    files = sorted(cached_files())
+    total = sum(size for _, size, _ in files)
+    limit = settings.IMAGE_CACHE_MAX_SIZE * EVICT_TO
+    for _, size, path in files:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+def account(size):
+    """Учитывает новый файл и при переполнении очищает кеш."""
+    with _usage_lock:
+        if _usage['bytes'] is None:
+            _usage['bytes'] = sum(size for _, size, _ in cached_files())
+        else:
+            _usage['bytes'] += size
+        if _usage['bytes'] > settings.IMAGE_CACHE_MAX_SIZE:
+            _usage['bytes'] = evict()
+
+
+def touch(path):
+    """Отмечает чтение для вытеснения; FileNotFoundError, если вытеснен."""
+    now = time.time()
+    if now - os.stat(path).st_mtime > TOUCH_INTERVAL:
+        os.utime(path, (now, now))
+
+
+def variant(spec, path):
+    """Путь к готовому варианту, при необходимости построенному.
+
+    Одновременные запросы одного варианта ждут на key_lock, и строит
+    его только первый; файл появляется в кеше целиком (os.replace).
+    """
+    key, target = cache_path(spec, path)
+    try:
+        touch(target)
+        return target
+    except FileNotFoundError:
+        pass
+    with key_lock(key):
+        if os.path.exists(target):
+            return target
+        data = render(spec, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(target), suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, target)
+    account(len(data))
+    return target
+
+
+@require_safe
+def resize(request, signed, path):
+    spec = parse(signed, path)
+    # вариант могли вытеснить между проверкой и открытием: строим снова
+    for _ in range(2):
+        try:
+            file = open(variant(spec, path), 'rb')
+        except FileNotFoundError:
+            continue
+        response = FileResponse(
+            file, content_type=images.FORMATS[spec.format][1])
+        patch_cache_control(response, public=True, max_age=MAX_AGE,
+                            immutable=True)
+        return response
+    raise Http404
@@ -0,0 +1,173 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Post
+from .stemmer import WORD, stem, stem_text
+
+FTS_TABLE = 'posts_post_fts'
+PG_TABLE = 'posts_post_search'
+
+
+def fts_query(query):
+    """Запрос FTS5 из основ слов: все слова обязательны."""
+    words = [stem(word) for word in WORD.findall(query)]
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+class SQLiteBackend:
+    """FTS5 по тексту, заранее приведённому к основам слов.
+
+    У FTS5 нет русского стемминга, поэтому и текст, и запрос
+    проходят через stemmer.stem — совпадения ищутся по основам.
+    """
+
+    def index(self, cursor, post_id, text):
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+            [post_id, stem_text(text)])
+
+    def remove(self, cursor, post_id):
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+
+    def count(self, cursor, query):
+        cursor.execute(
+            f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [fts_query(query)])
+        return cursor.fetchone()[0]
+
+    def ids(self, cursor, query, offset, limit):
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY rank LIMIT %s OFFSET %s',
+            [fts_query(query), limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresBackend:
+    """tsvector с русским словарём и GIN-индексом."""
+
+    def index(self, cursor, post_id, text):
+        cursor.execute(
+            f'INSERT INTO {PG_TABLE} (post_id, document) '
+            f"VALUES (%s, to_tsvector('russian', %s)) "
+            f'ON CONFLICT (post_id) DO UPDATE '
+            f'SET document = EXCLUDED.document',
+            [post_id, text])
+
+    def remove(self, cursor, post_id):
+        cursor.execute(f'DELETE FROM {PG_TABLE} WHERE post_id = %s',
+                       [post_id])
+
+    def count(self, cursor, query):
+        cursor.execute(
+            f'SELECT count(*) FROM {PG_TABLE} '
+            f"WHERE document @@ plainto_tsquery('russian', %s)",
+            [query])
+        return cursor.fetchone()[0]
+
+    def ids(self, cursor, query, offset, limit):
+        cursor.execute(
+            f'SELECT post_id FROM {PG_TABLE}, '
+            f"plainto_tsquery('russian', %s) query "
+            f'WHERE document @@ query '
+            f'ORDER BY ts_rank(document, query) DESC, post_id DESC '
+            f'LIMIT %s OFFSET %s',
+            [query, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class LikeBackend:
+    """Запасной вариант для прочих баз: без индекса, подстрокой.
+
+    Все слова запроса должны встретиться в тексте; порядок — по дате.
+    """
+
+    def index(self, cursor, post_id, text):
+        pass
+
+    def remove(self, cursor, post_id):
+        pass
+
+    def matches(self, query):
+        condition = Q()
+        for word in WORD.findall(query):
+            condition &= Q(text__icontains=word)
+        return Post.objects.filter(condition).order_by('-pub_date', '-pk')
+
+    def count(self, cursor, query):
+        return self.matches(query).count()
+
+    def ids(self, cursor, query, offset, limit):
+        return list(self.matches(query).values_list(
+            'pk', flat=True)[offset:offset + limit])
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend(),
+    'postgresql': PostgresBackend(),
+}
+FALLBACK = LikeBackend()
+
+
+def backend():
+    return BACKENDS.get(connection.vendor, FALLBACK)
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        backend().index(cursor, post.pk, post.text)
+
+
+def remove_post(post_id):
+    with connection.cursor() as cursor:
+        backend().remove(cursor, post_id)
+
+
+def rebuild_index(posts=None):
+    """Заново индексирует посты (по умолчанию все); возвращает их число."""
+    if posts is None:
+        posts = Post.objects.all()
+    count = 0
+    with connection.cursor() as cursor:
+        for pk, text in posts.values_list('pk', 'text').iterator():
+            backend().index(cursor, pk, text)
+            count += 1
+    return count
+
+
+def matching_ids(query, limit=None):
+    """id постов по убыванию релевантности."""
+    if not WORD.search(query):
+        return []
+    with connection.cursor() as cursor:
+        return backend().ids(
+            cursor, query, 0, limit or settings.SEARCH_MAX_RESULTS)
+
+
+class SearchResults:
+    """Ленивый список найденных постов для Paginator.
+
+    count() и срезы идут прямо в полнотекстовый индекс, так что
+    страница загружает из posts_post только свои посты.
+    """
+
+    def __init__(self, query):
+        self.query = query
+
+    def count(self):
+        if not WORD.search(self.query):
+            return 0
+        with connection.cursor() as cursor:
+            return min(backend().count(cursor, self.query),
+                       settings.SEARCH_MAX_RESULTS)
+
+    def __getitem__(self, index):
+        with connection.cursor() as cursor:
+            ids = backend().ids(
+                cursor, self.query, index.start, index.stop - index.start)
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
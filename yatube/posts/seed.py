@@ -0,0 +1,307 @@
+import itertools
+import multiprocessing
+import os
+import random
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import django
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, connections
+from django.utils import timezone
+from PIL import Image
+
+from .counters import rebuild_counters
+from .feed import fill_feeds, update_pull_mode
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .search import rebuild_index
+from .versions import GLOBAL, bump
+
+# Синтетические данные для нагрузочных замеров (команда seed_scale).
+# Каждый кусок строится своим генератором random.Random(seed:вид:номер),
+# а первичные ключи заранее поделены между кусками, поэтому результат
+# не зависит ни от числа процессов, ни от порядка их завершения.
+BATCH_SIZE = 1000
+# от этого момента по умолчанию отсчитываются даты: одинаковый seed
+# даёт одинаковые данные в любой день
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+IMAGES_DIR = 'posts/seed'
+IMAGE_COLORS = ('#d9534f', '#f0ad4e', '#5cb85c', '#5bc0de', '#337ab7',
+                '#292b2c', '#8e44ad', '#16a085')
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Алексей',
+               'Елена', 'Дмитрий', 'Наталья', 'Сергей', 'Татьяна', 'Андрей')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+              'Петров', 'Соколов', 'Михайлов', 'Новиков', 'Фёдоров')
+WORDS = (
+    'город утро дорога река лес книга песня друг работа проект день '
+    'вечер кошка собака море поезд новость погода дом окно весна лето '
+    'осень зима сегодня вчера снова очень хороший новый старый большой '
+    'тихий быстрый читать писать смотреть думать гулять ждать встретить '
+    'рассказать увидеть купить приготовить написал прочитала посмотрели'
+).split()
+
+# кеш распределений популярности на процесс: строится один раз
+_popularity = {}
+
+
+def batch_size(model):
+    # bulk_create в Django 2.2 не урезает явный batch_size до лимитов СУБД
+    fields = model._meta.concrete_fields
+    return min(BATCH_SIZE, connection.ops.bulk_batch_size(fields, []))
+
+
+def chunk_rng(seed, kind, number):
+    return random.Random(f'{seed}:{kind}:{number}')
+
+
+def popularity(plan):
+    """Накопленные веса Ципфа и соответствие ранга пользователю.
+
+    Ранг r получает вес 1 / r ** skew: немногие пользователи собирают
+    большинство подписчиков и пишут большую часть постов.
+    """
+    key = (plan['seed'], plan['users'], plan['skew'])
+    if key not in _popularity:
+        ranks = list(range(plan['users']))
+        random.Random(f"{plan['seed']}:ranks").shuffle(ranks)
+        cum_weights = list(itertools.accumulate(
+            1 / rank ** plan['skew'] for rank in range(1, plan['users'] + 1)))
+        _popularity[key] = ranks, cum_weights
+    return _popularity[key]
+
+
+def popular_user(rng, plan):
+    ranks, cum_weights = popularity(plan)
+    rank = bisect(cum_weights, rng.random() * cum_weights[-1])
+    return plan['first_user'] + ranks[min(rank, len(ranks) - 1)]
+
+
+def random_user(rng, plan):
+    return plan['first_user'] + rng.randrange(plan['users'])
+
+
+def random_text(rng, low, high):
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return ' '.join(words).capitalize() + '.'
+
+
+def seed_users(rng, plan, first, count):
+    joined = plan['now'] - timedelta(days=plan['days'])
+    User.objects.bulk_create(
+        (User(pk=pk, username=f'seed_{pk}', password='!',
+              first_name=rng.choice(FIRST_NAMES),
+              last_name=rng.choice(LAST_NAMES),
+              date_joined=joined)
+         for pk in range(first, first + count)),
+        batch_size=batch_size(User),
+    )
+
+
+def seed_follows(rng, plan, first, count):
+    """Каждый пользователь подписывается на авторов по закону Ципфа."""
+    follows = []
+    per_user = min(plan['follows_per_user'], plan['users'] - 1)
+    for user_id in range(first, first + count):
+        authors = set()
+        for _ in range(per_user * 10):
+            if len(authors) == per_user:
+                break
+            author_id = popular_user(rng, plan)
+            if author_id != user_id:
+                authors.add(author_id)
+        follows.extend(Follow(user_id=user_id, author_id=author_id)
+                       for author_id in sorted(authors))
+    Follow.objects.bulk_create(follows, batch_size=batch_size(Follow),
+                               ignore_conflicts=True)
+
+
+def seed_posts(rng, plan, first, count):
+    """Посты сериями: автор пишет несколько постов подряд, потом молчит."""
+    now = plan['now']
+    span = timedelta(days=plan['days']).total_seconds()
+    posts = []
+    comments = []
+    while len(posts) < count:
+        author_id = popular_user(rng, plan)
+        moment = now - timedelta(seconds=rng.random() * span)
+        burst = min(int(rng.paretovariate(1.2)), 50, count - len(posts))
+        for _ in range(burst):
+            post = Post(
+                pk=first + len(posts),
+                text=random_text(rng, 5, 60),
+                author_id=author_id,
+                pub_date=min(moment, now),
+            )
+            if plan['groups'] and rng.random() < 0.7:
+                post.group_id = plan['first_group'] + rng.randrange(
+                    plan['groups'])
+            if rng.random() < plan['image_ratio']:
+                post.image = plan['images'][rng.randrange(
+                    len(plan['images']))]
+            if plan['comments_per_post']:
+                post.comments_count = int(
+                    rng.expovariate(1 / plan['comments_per_post']))
+            comments.extend(seed_comments(rng, plan, post))
+            posts.append(post)
+            moment += timedelta(seconds=rng.expovariate(1 / 900))
+    with explicit_dates(Post):
+        Post.objects.bulk_create(posts, batch_size=batch_size(Post))
+    with explicit_dates(Comment):
+        Comment.objects.bulk_create(comments, batch_size=batch_size(Comment))
+
+
+def seed_comments(rng, plan, post):
+    created = post.pub_date
+    for _ in range(post.comments_count):
+        created += timedelta(seconds=rng.expovariate(1 / 3600))
+        yield Comment(post_id=post.pk, author_id=random_user(rng, plan),
+                      text=random_text(rng, 2, 20),
+                      created=min(created, plan['now']))
+
+
+SEEDERS = {
+    'users': seed_users,
+    'follows': seed_follows,
+    'posts': seed_posts,
+}
+
+
+# поля auto_now_add, которым bulk_create передаёт даты из данных
+AUTO_DATES = {Post: 'pub_date', Comment: 'created'}
+
+
+@contextmanager
+def explicit_dates(model):
+    """bulk_create модели model с заданной датой вместо auto_now_add.
+
+    Флаг снимается с поля модели на весь процесс, поэтому блок должен
+    охватывать один вызов bulk_create и ничего больше. Только для команд
+    управления (seed_scale, import_posts), не для представлений сайта.
+    """
+    field = model._meta.get_field(AUTO_DATES[model])
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def init_worker():
+    # при fork процесс наследует соединения родителя, их нельзя делить
+    django.setup()
+    connections.close_all()
+
+
+def run_chunk(task):
+    kind, number, first, count, plan = task
+    SEEDERS[kind](chunk_rng(plan['seed'], kind, number), plan, first, count)
+    return kind, count
+
+
+def chunks(kind, first, total, plan):
+    size = plan['chunk_size']
+    for number, offset in enumerate(range(0, total, size)):
+        yield kind, number, first + offset, min(size, total - offset), plan
+
+
+def next_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def seed_images(seed):
+    """Несколько картинок-заглушек в MEDIA_ROOT для постов с изображением."""
+    directory = os.path.join(settings.MEDIA_ROOT, IMAGES_DIR)
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for number, color in enumerate(IMAGE_COLORS):
+        name = f'{IMAGES_DIR}/seed_{seed}_{number}.png'
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        if not os.path.exists(path):
+            Image.new('RGB', (960, 540), color).save(path)
+        names.append(name)
+    return names
+
+
+def seed_groups(plan):
+    Group.objects.bulk_create(
+        Group(pk=pk, title=f'Сообщество {pk}', slug=f'seed-{pk}',
+              description=random_text(chunk_rng(plan['seed'], 'groups', pk),
+                                      5, 20))
+        for pk in range(plan['first_group'],
+                        plan['first_group'] + plan['groups'])
+    )
+
+
+def reset_sequences(models=(User, Group, Post)):
+    """Ключи заданы явно, поэтому счётчики автоинкремента нужно сдвинуть."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def seed_database(users, posts, follows_per_user, groups=20,
+                  comments_per_post=3, image_ratio=0.2, days=365, skew=1.0,
+                  seed=1, chunk_size=5000, workers=1, now=EPOCH,
+                  report=lambda kind, count: None):
+    """Создаёт данные и приводит в порядок всё, что обходит bulk_create.
+
+    Сигналы при bulk_create не срабатывают, поэтому счётчики, ленты
+    подписок и поисковый индекс достраиваются в конце отдельно.
+    report(kind, count) вызывается после каждого готового куска.
+    """
+    plan = {
+        'users': users,
+        'groups': groups,
+        'follows_per_user': follows_per_user,
+        'comments_per_post': comments_per_post,
+        'image_ratio': image_ratio,
+        'days': days,
+        'skew': skew,
+        'seed': seed,
+        'chunk_size': chunk_size,
+        'first_user': next_pk(User),
+        'first_group': next_pk(Group),
+        'images': seed_images(seed) if image_ratio else [],
+        # даты отсчитываются от одного момента на весь запуск
+        'now': now,
+    }
+    first_post = next_pk(Post)
+    seed_groups(plan)
+    stages = (
+        chunks('users', plan['first_user'], users, plan),
+        itertools.chain(
+            chunks('follows', plan['first_user'], users, plan),
+            chunks('posts', first_post, posts, plan)),
+    )
+    if workers > 1:
+        connections.close_all()
+        with multiprocessing.Pool(workers, init_worker) as pool:
+            for tasks in stages:
+                for kind, count in pool.imap_unordered(run_chunk, tasks):
+                    report(kind, count)
+    else:
+        for tasks in stages:
+            for kind, count in map(run_chunk, tasks):
+                report(kind, count)
+
+    reset_sequences()
+    rebuild_counters()
+    update_pull_mode(UserStats.objects.all())
+    feed_entries = fill_feeds(
+        Follow.objects.filter(user_id__gte=plan['first_user']))
+    indexed = rebuild_index(Post.objects.filter(pk__gte=first_post))
+    bump(GLOBAL)
+    return {
+        'users': users,
+        'groups': groups,
+        'posts': posts,
+        'follows': Follow.objects.filter(
+            user_id__gte=plan['first_user']).count(),
+        'comments': Comment.objects.filter(post_id__gte=first_post).count(),
+        'feed_entries': feed_entries,
+        'indexed': indexed,
+    }
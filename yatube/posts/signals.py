@@ -0,0 +1,187 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import blobs, feed, search, thumbnails
+from .cards import invalidate_card, invalidate_cards
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .versions import GLOBAL, author_tag, bump, follow_tag, group_tag
+
+
+def bump_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик через F(), без чтения строки в Python."""
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def bump_stats(user_id, field, delta):
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta})
+
+
+def bump_feeds(author_id, *group_ids):
+    """Сдвигает версии лент, в которых виден пост автора."""
+    bump(GLOBAL, author_tag(author_id),
+         *(group_tag(pk) for pk in group_ids if pk is not None))
+
+
+def bump_post_feeds(post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id').first()
+    if post is not None:
+        bump_feeds(post['author_id'], post['group_id'])
+
+
+def renamed(instance, fields, update_fields):
+    """Изменилось ли при сохранении одно из полей, видных в карточке."""
+    if instance.pk is None:
+        return False
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return False
+    old = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+    return old is not None and any(
+        old[field] != getattr(instance, field) for field in fields)
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, update_fields=None, **kwargs):
+    instance._renamed = renamed(instance, ('title', 'slug'), update_fields)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    bump(group_tag(instance.pk))
+    # название и адрес группы зашиты в карточки её постов, а они видны
+    # и на главной
+    if getattr(instance, '_renamed', False):
+        bump(GLOBAL)
+        invalidate_cards(Post.objects.filter(group=instance))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # SET_NULL отвязывает посты одним UPDATE без сигналов Post, а после
+    # него их уже не найти по группе
+    posts = Post.objects.filter(group=instance)
+    instance._post_ids = list(posts.values_list('pk', flat=True))
+    instance._author_ids = set(posts.values_list('author_id', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    post_ids = getattr(instance, '_post_ids', [])
+    invalidate_cards(Post.objects.filter(pk__in=post_ids))
+    bump(GLOBAL, group_tag(instance.pk),
+         *(author_tag(pk) for pk in getattr(instance, '_author_ids', ())))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    instance._renamed = renamed(instance, ('username',), update_fields)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # имя автора зашито в его карточки и в ответы API
+    if getattr(instance, '_renamed', False):
+        bump(GLOBAL, author_tag(instance.pk))
+        invalidate_cards(Post.objects.filter(author=instance))
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    old = None
+    if instance.pk is not None:
+        old = Post.objects.filter(pk=instance.pk).values(
+            'group_id', 'image', 'image_variants').first()
+    # при смене группы пост пропадает из ленты прежней группы
+    instance._old_group_id = old and old['group_id']
+    # миниатюра новой картинки ещё не построена, а варианты, размеры
+    # и заглушка прежней ей не подходят, если не построены заново (PostForm)
+    if old is not None and (old['image'] or '') != (instance.image.name or ''):
+        instance.thumbnail = ''
+        if instance.image_variants == old['image_variants']:
+            instance.image_variants = ''
+            instance.image_width = instance.image_height = None
+            instance.image_placeholder = ''
+    instance._old_blobs = (
+        blobs.post_blobs(old['image'], old['image_variants']) if old
+        else set())
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields=None, **kwargs):
+    invalidate_card(instance.pk)
+    bump_feeds(instance.author_id, instance.group_id, instance._old_group_id)
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+    if created:
+        bump_stats(instance.author_id, 'posts_count', 1)
+        feed.fan_out(instance)
+    # имя загруженного файла известно только после сохранения поля;
+    # сохранение других полей (миниатюры) ссылки на файлы не меняет
+    if update_fields is None or {'image', 'image_variants'} & update_fields:
+        new_blobs = blobs.post_blobs(instance.image.name,
+                                     instance.image_variants)
+        blobs.acquire(new_blobs - instance._old_blobs)
+        blobs.release(instance._old_blobs - new_blobs)
+    # картинкам из PostForm миниатюра не нужна, у них есть варианты
+    if (instance.image and not instance.thumbnail
+            and not instance.image_variants):
+        transaction.on_commit(lambda: thumbnails.enqueue(instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_card(instance.pk)
+    bump_feeds(instance.author_id, instance.group_id)
+    search.remove_post(instance.pk)
+    bump_stats(instance.author_id, 'posts_count', -1)
+    blobs.release(blobs.post_blobs(instance.image.name,
+                                   instance.image_variants))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if instance.post_id is None:
+        return
+    if created:
+        bump_counter(Post, instance.post_id, 'comments_count', 1)
+    invalidate_card(instance.post_id)
+    bump_post_feeds(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        bump_counter(Post, instance.post_id, 'comments_count', -1)
+        invalidate_card(instance.post_id)
+        bump_post_feeds(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        bump_stats(instance.user_id, 'following_count', 1)
+        bump_stats(instance.author_id, 'followers_count', 1)
+        feed.update_pull_mode(
+            UserStats.objects.filter(user_id=instance.author_id))
+        feed.backfill(instance.user_id, instance.author_id)
+        # у автора изменилось число подписчиков на его страницах
+        bump(follow_tag(instance.user_id), author_tag(instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_stats(instance.user_id, 'following_count', -1)
+    bump_stats(instance.author_id, 'followers_count', -1)
+    feed.prune(instance.user_id, instance.author_id)
+    feed.update_pull_mode(UserStats.objects.filter(user_id=instance.author_id))
+    bump(follow_tag(instance.user_id), author_tag(instance.author_id))
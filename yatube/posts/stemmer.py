@@ -0,0 +1,68 @@
+import re
+
+# Русский стеммер Snowball (Портер), по описанию
+# https://snowballstem.org/algorithms/russian/stemmer.html
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено'
+    r'|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем'
+    r'|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+I_ENDING = re.compile(r'и$')
+# окончание -ост(ь) снимается, только если оно целиком в R2
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DER = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+DOUBLE_N = re.compile(r'нн$')
+SOFT_SIGN = re.compile(r'ь$')
+
+WORD = re.compile(r'\w+')
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+
+    # шаг 1: деепричастие, иначе возвратность и прилагательное,
+    # глагол или существительное
+    stripped = PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped != rv:
+        rv = stripped
+    else:
+        rv = REFLEXIVE.sub('', rv, 1)
+        stripped = ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if stripped == rv else stripped
+
+    # шаг 2
+    rv = I_ENDING.sub('', rv, 1)
+    # шаг 3
+    if DERIVATIONAL.match(rv):
+        rv = DER.sub('', rv, 1)
+    # шаг 4
+    stripped = SOFT_SIGN.sub('', rv, 1)
+    if stripped != rv:
+        rv = stripped
+    else:
+        rv = DOUBLE_N.sub('н', SUPERLATIVE.sub('', rv, 1), 1)
+    return start + rv
+
+
+def stem_text(text):
+    """Текст как строка основ слов через пробел."""
+    return ' '.join(stem(word) for word in WORD.findall(text))
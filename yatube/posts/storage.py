@@ -0,0 +1,79 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Картинки постов хранятся по хешу содержимого: posts/ab/<sha256>.jpg.
+# Одинаковые загрузки (и одинаковые варианты одной картинки) ложатся
+# в один файл, а сколько постов на него ссылается, считает posts/blobs.py.
+BLOB_NAME = re.compile(r'^(?:[\w-]+/)?[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w+)?$')
+
+
+def top_directory(name):
+    return name.split('/', 1)[0] if '/' in name else ''
+
+
+def blob_name(name, digest):
+    """Имя по хешу digest с каталогом верхнего уровня и расширением name."""
+    directory = top_directory(name)
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+def is_blob(name):
+    return bool(name) and BLOB_NAME.match(name) is not None
+
+
+@deconstructible
+class HashedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла — хеш его содержимого.
+
+    Загрузка пишется во временный файл рядом с MEDIA_ROOT и хешируется
+    по ходу записи, за один проход. Если такой файл уже есть, копия
+    удаляется, а save() обновит время файла и вернёт его имя.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory = self.path(top_directory(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(dir=directory,
+                                                 suffix='.upload')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            name = blob_name(name, digest.hexdigest())
+            path = self.path(name)
+            try:
+                # свежее время файла: collect() не удалит его, пока
+                # загрузка ещё не получила ссылку через acquire()
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            else:
+                os.remove(temporary)
+                return name
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+            # одновременная загрузка того же файла перезапишет его
+            # тем же содержимым
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+
+blob_storage = HashedStorage()
@@ -0,0 +1,36 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from ..images import FALLBACK, FORMATS
+
+register = template.Library()
+
+# карточка во всю ширину колонки, не шире 960px
+CARD_SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+def srcset(files):
+    return ', '.join(f'{default_storage.url(name)} {width}w'
+                     for width, name in files)
+
+
+@register.inclusion_tag('picture.html')
+def picture(post, sizes=CARD_SIZES):
+    """<picture> с вариантами картинки: формат и ширину выбирает браузер.
+
+    Ширина и высота резервируют место под картинку до её загрузки.
+    """
+    variants = post.variants
+    sources = variants['sources']
+    return {
+        'sources': [
+            {'type': FORMATS[name][1], 'srcset': srcset(files)}
+            for name, files in sources.items() if name != FALLBACK
+        ],
+        'src': default_storage.url(sources[FALLBACK][-1][1]),
+        'srcset': srcset(sources[FALLBACK]),
+        'sizes': sizes,
+        'width': post.image_width or variants['width'],
+        'height': post.image_height or variants['height'],
+        'placeholder': post.image_placeholder,
+    }
@@ -0,0 +1,16 @@
+from django import template
+
+from ..paginators import ELLIPSIS, elided_page_range
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_links(page):
+    return list(elided_page_range(page.paginator, page.number))
+
+
+@register.filter
+def is_gap(link):
+    """Пропуск в номерах страниц, а не номер."""
+    return link == ELLIPSIS
@@ -3,3 +3,4 @@ import tempfile
 from django.conf import settings
 
 settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+settings.IMAGE_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
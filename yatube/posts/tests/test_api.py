@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..api import DEFAULT_FIELDS
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PostsAPITest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='api group',
+            slug='api-group',
+            description='api-group-description',
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Пост {number}', author=cls.author,
+                                group=cls.group if number % 2 else None)
+            for number in range(15)
+        ]
+        cls.posts.reverse()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def ids(self, data):
+        return [item['id'] for item in data['results']]
+
+    def test_feeds_use_cursor_pagination(self):
+        """Ленты API листаются курсором от новых постов к старым."""
+        urls = {
+            reverse('api_index'): self.posts,
+            reverse('api_group', args=[self.group.slug]): [
+                post for post in self.posts if post.group_id],
+            reverse('api_profile', args=[self.author.username]): self.posts,
+        }
+        for url, expected in urls.items():
+            with self.subTest(url=url):
+                first = self.client.get(url, {'limit': 5}).json()
+                second = self.client.get(
+                    url, {'limit': 10, 'cursor': first['next']}).json()
+                self.assertIsNone(first['previous'])
+                self.assertEqual(
+                    self.ids(first) + self.ids(second),
+                    [post.pk for post in expected],
+                )
+
+    def test_default_fields(self):
+        """По умолчанию отдаются основные поля поста."""
+        post = self.posts[1]
+        data = self.client.get(reverse('api_post', args=[post.pk])).json()
+        self.assertEqual(tuple(data), DEFAULT_FIELDS)
+        self.assertEqual(data['author'], self.author.username)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(data['text'], post.text)
+
+    def test_sparse_fields_and_comments_count(self):
+        """?fields= ограничивает поля и добавляет число комментариев."""
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий')
+        data = self.client.get(
+            reverse('api_index'),
+            {'fields': 'text,comments_count', 'limit': 2},
+        ).json()
+        self.assertEqual(data['results'], [
+            {'text': 'Пост 14', 'comments_count': 1},
+            {'text': 'Пост 13', 'comments_count': 0},
+        ])
+        second = self.client.get(
+            reverse('api_index'),
+            {'fields': 'text', 'limit': 2, 'cursor': data['next']},
+        ).json()
+        self.assertEqual([item['text'] for item in second['results']],
+                         ['Пост 12', 'Пост 11'])
+
+    def test_errors(self):
+        """Неизвестные поля, чужие адреса и лента без входа — ошибки JSON."""
+        cases = (
+            (reverse('api_index'), {'fields': 'text,password'}, 400),
+            (reverse('api_index'), {'limit': 'много'}, 400),
+            (reverse('api_post', args=[0]), {}, 404),
+            (reverse('api_group', args=['no-group']), {}, 404),
+            (reverse('api_profile', args=['nobody']), {}, 404),
+            (reverse('api_follow'), {}, 401),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_follow_feed(self):
+        """Лента подписок доступна после входа."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        data = self.client.get(reverse('api_follow'), {'limit': 20}).json()
+        self.assertEqual(self.ids(data), [post.pk for post in self.posts])
+
+    def test_cached_response_is_invalidated(self):
+        """Ответ кешируется и сбрасывается вместе с HTML-лентами."""
+        url = reverse('api_index')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(self.ids(self.client.get(url).json())[0],
+                         new_post.pk)
+
+    def test_conditional_get(self):
+        """Неизменённый ответ API отдаётся как 304."""
+        url = reverse('api_post', args=[self.posts[0].pk])
+        response = self.client.get(url)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..benchmark import percentile, regressions
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class BenchHttpTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='bench_author')
+        reader = User.objects.create_user(username='bench_reader')
+        group = Group.objects.create(
+            title='bench group', slug='bench-group', description='-')
+        Follow.objects.create(user=reader, author=author)
+        for number in range(5):
+            Post.objects.create(
+                text=f'Замер {number}', author=author, group=group)
+
+    def bench(self, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('bench_http', '--concurrency=1', '--warmup=0',
+                         f'--output={output}', *args, stdout=StringIO())
+            with open(output) as file:
+                return json.load(file)
+
+    def test_report_covers_every_url_name(self):
+        """Отчёт содержит задержки и SQL по каждому имени URL."""
+        results = self.bench('--mix=members', '--requests=60')['results']
+        for name in ('index', 'groups', 'profile', 'post',
+                     'follow_index', 'add_comment'):
+            with self.subTest(name=name):
+                self.assertEqual(results[name]['errors'], 0)
+                self.assertLessEqual(
+                    results[name]['p50_ms'], results[name]['p99_ms'])
+                self.assertGreater(results[name]['queries'], 0)
+        self.assertEqual(results['total']['requests'], 60)
+        self.assertEqual(
+            Comment.objects.count(), results['add_comment']['requests'])
+
+    def test_regression_fails_the_run(self):
+        """Рост числа SQL-запросов против базового прогона — ошибка."""
+        baseline = {'index': {'p95_ms': 1000, 'queries': 0.1}}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump({'results': baseline}, file)
+            file.flush()
+            with self.assertRaisesMessage(CommandError, 'index: queries'):
+                self.bench('--mix=index=1', '--requests=3',
+                           f'--baseline={file.name}')
+
+    def test_percentiles_and_regressions(self):
+        """Перцентили по ближайшему рангу, допуск в процентах."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertEqual(regressions(
+            {'post': {'p95_ms': 11, 'queries': 4}},
+            {'post': {'p95_ms': 10, 'queries': 4}}, 20), [])
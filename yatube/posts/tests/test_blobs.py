@@ -0,0 +1,117 @@
+import io
+import os
+import shutil
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from .. import blobs
+from ..models import ImageBlob, Post, User
+from ..storage import blob_storage, is_blob
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def upload(name='small.gif', content=SMALL_GIF):
+    return SimpleUploadedFile(name=name, content=content,
+                              content_type='image/gif')
+
+
+class BlobTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='reposter')
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(settings.IMAGE_CACHE_DIR, ignore_errors=True)
+
+    def post(self, image):
+        return Post.objects.create(text='Пост', author=self.author,
+                                   image=image)
+
+    def refs(self, name):
+        blob = ImageBlob.objects.filter(name=name).first()
+        return blob and blob.refs
+
+    def age(self, name):
+        """Файл загружен давно: уборке ничто не мешает."""
+        moment = time.time() - 2 * blobs.ORPHAN_AGE
+        os.utime(default_storage.path(name), (moment, moment))
+
+    def test_same_upload_is_stored_once(self):
+        """Одинаковые загрузки ссылаются на один файл."""
+        first = self.post(upload('first.gif'))
+        second = self.post(upload('second.gif'))
+        self.assertTrue(is_blob(first.image.name))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(
+            first.image.path))), 1)
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_file_is_removed_with_last_reference(self):
+        """Файл удаляется, когда на него не ссылается ни один пост."""
+        first = self.post(upload())
+        second = self.post(upload())
+        name = first.image.name
+        self.age(name)
+        first.delete()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(self.refs(name), 1)
+        second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertIsNone(self.refs(name))
+
+    def test_replaced_image_is_released(self):
+        """Замена картинки освобождает прежний файл."""
+        post = self.post(upload())
+        old = post.image.name
+        self.age(old)
+        post.image = upload('other.gif', SMALL_GIF + b'\x00')
+        post.save()
+        self.assertNotEqual(post.image.name, old)
+        self.assertFalse(default_storage.exists(old))
+        self.assertEqual(self.refs(post.image.name), 1)
+
+    def test_uploaded_again_before_collect(self):
+        """Файл, загруженный заново до уборки, не удаляется."""
+        post = self.post(upload())
+        name = post.image.name
+        self.age(name)
+        with mock.patch.object(blobs, 'collect'):
+            post.delete()
+        self.assertEqual(self.refs(name), 0)
+        # новый пост с той же картинкой: файл есть, ссылки ещё нет
+        self.assertEqual(blob_storage.save('posts/again.gif', upload()), name)
+        blobs.collect({name})
+        self.assertTrue(default_storage.exists(name))
+        self.post(name)
+        self.assertEqual(self.refs(name), 1)
+
+    def test_dedup_media(self):
+        """dedup_media перекладывает старые файлы по хешу."""
+        for name in ('posts/a.gif', 'posts/b.gif', 'posts/orphan.gif'):
+            default_storage.save(name, io.BytesIO(SMALL_GIF))
+        posts = [self.post('posts/a.gif'), self.post('posts/b.gif')]
+        call_command('dedup_media', stdout=io.StringIO())
+        names = {post.image.name
+                 for post in Post.objects.filter(pk__in=[
+                     post.pk for post in posts])}
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_blob(name))
+        self.assertEqual(self.refs(name), 2)
+        for old in ('posts/a.gif', 'posts/b.gif', 'posts/orphan.gif'):
+            self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(name))
@@ -0,0 +1,51 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+
+from yatube.cache import TwoTierCache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-shared',
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self):
+        # два экземпляра имитируют два процесса с общим кешем
+        params = {'OPTIONS': {'IMMUTABLE_PREFIXES': ['card:']}}
+        self.first = TwoTierCache('shared', params)
+        self.second = TwoTierCache('shared', params)
+        self.shared = LocMemCache('two-tier-shared', {})
+        self.shared.clear()
+
+    def test_immutable_keys_are_served_locally(self):
+        """Неизменяемые ключи читаются из памяти процесса."""
+        self.first.set('card:1', 'html')
+        self.shared.clear()
+        self.assertEqual(self.first.get('card:1'), 'html')
+        self.assertIsNone(self.second.get('card:1'))
+
+    def test_mutable_keys_are_shared_between_processes(self):
+        """Изменение версии в одном процессе сразу видно в другом."""
+        self.first.set('version:global', '1')
+        self.assertEqual(self.second.get('version:global'), '1')
+        self.second.set('version:global', '2')
+        self.assertEqual(self.first.get_many(['version:global']),
+                         {'version:global': '2'})
+
+    def test_local_tier_is_bounded(self):
+        """Локальный уровень вытесняет самые старые записи."""
+        cache = TwoTierCache('shared', {
+            'OPTIONS': {'IMMUTABLE_PREFIXES': ['card:'], 'MAX_ENTRIES': 2},
+        })
+        for number in range(3):
+            cache.set(f'card:{number}', number)
+        self.shared.clear()
+        self.assertIsNone(cache.get('card:0'))
+        self.assertEqual(cache.get('card:2'), 2)
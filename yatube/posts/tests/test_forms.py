@@ -1,12 +1,17 @@
 import shutil
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import images
 from ..models import Comment, Group, Post
 
 User = get_user_model()
@@ -75,7 +80,10 @@ class PostCreateFormTests(TestCase):
         post_get = Post.objects.get(pk=2)
         self.assertEqual(post_get.text, form_data['text'])
         self.assertEqual(post_get.group, self.group)
-        self.assertEqual(post_get.image.name, f'posts/{uploaded.name}')
+        # загрузка перекодирована в JPEG, исходный GIF не хранится
+        self.assertRegex(post_get.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(post_get.variants['width'], 2)
 
     def test_edit_post(self):
         """Форма проверяет редактирование поста."""
@@ -98,7 +106,7 @@ class PostCreateFormTests(TestCase):
                 id=1,
                 text='Отредактированый текст',
                 author=self.author, group=self.group,
-                image='posts/big.gif'
+                image=self.post.image.name
             ).exists()
         )
 
@@ -146,3 +154,99 @@ class PostCreateFormTests(TestCase):
                 text='Текст неавторизованного комментария',
             ).exists()
         )
+
+
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def photo(self, size=(2000, 1000)):
+        """JPEG с EXIF: камера и поворот на 90° (Orientation = 6)."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        Image.new('RGB', size, 'teal').save(
+            buffer, 'JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile('Фото.jpg', buffer.getvalue(),
+                                  content_type='image/jpeg')
+
+    def upload(self, image):
+        return self.client.post(reverse('new_post'),
+                                {'text': 'С картинкой', 'image': image})
+
+    def test_upload_is_reencoded(self):
+        """Загрузка повёрнута по EXIF и перекодирована без метаданных."""
+        self.upload(self.photo())
+        post = Post.objects.get(text='С картинкой')
+        sources = post.variants['sources']
+        self.assertEqual(list(sources), images.formats())
+        # после поворота ширина 1000: шире вариантов не бывает
+        for name, files in sources.items():
+            with self.subTest(format=name):
+                self.assertEqual([width for width, _ in files],
+                                 [320, 640, 960, 1000])
+        self.assertEqual(post.image.name, sources['jpeg'][-1][1])
+        self.assertIsNone(post.variants['original'])
+        self.assertEqual(post.thumbnail, '')
+        with default_storage.open(post.image.name) as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (1000, 2000))
+            self.assertNotIn('exif', image.info)
+
+    def test_card_uses_srcset(self):
+        """Карточка отдаёт варианты через <picture> и srcset."""
+        self.upload(self.photo())
+        content = self.client.get(reverse('index')).content.decode()
+        self.assertIn('<source type="image/webp"', content)
+        self.assertIn('320w', content)
+
+    def test_card_reserves_space(self):
+        """Карточка знает размеры картинки и показывает заглушку."""
+        self.upload(self.photo())
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (1000, 2000))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/webp;base64,'))
+        self.assertNotIn('placeholder', post.variants)
+        content = self.client.get(reverse('index')).content.decode()
+        self.assertIn('width="1000" height="2000" loading="lazy"', content)
+        self.assertIn(post.image_placeholder, content)
+
+    def test_limits(self):
+        """Слишком большой файл или картинка не принимаются."""
+        for limits in ({'IMAGE_MAX_UPLOAD_SIZE': 100},
+                       {'IMAGE_MAX_PIXELS': 1000}):
+            with self.subTest(limits=limits), override_settings(**limits):
+                response = self.upload(self.photo())
+                self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_broken_image(self):
+        """Обрезанный JPEG — ошибка формы, а не 500."""
+        photo = self.photo().read()
+        response = self.upload(SimpleUploadedFile(
+            'Фото.jpg', photo[:len(photo) // 2], content_type='image/jpeg'))
+        self.assertTrue(response.context['form'].has_error(
+            'image', 'broken_image'))
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_KEEP_ORIGINAL=True)
+    def test_original_is_kept_if_configured(self):
+        """Исходный файл сохраняется только по настройке."""
+        self.upload(self.photo((100, 50)))
+        variants = Post.objects.get().variants
+        self.assertTrue(variants['original'].endswith('.jpg'))
+        self.assertTrue(default_storage.exists(variants['original']))
@@ -0,0 +1,123 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube.metrics import Registry, registry
+
+from ..models import Post
+
+User = get_user_model()
+
+
+def sample(text, name, **labels):
+    """Значение метрики name с метками labels из ответа /metrics."""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(
+        rf'^{name}\{{{re.escape(label_text)}\}} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='metrics_author')
+        Post.objects.create(text='Метрики', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        registry.counters.clear()
+        registry.histograms.clear()
+        self.client = Client()
+
+    def metrics(self):
+        return self.client.get(reverse('metrics')).content.decode()
+
+    def test_request_is_recorded_by_url_name(self):
+        """Ответ учтён под именем URL: время, SQL, кеш и шаблоны."""
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        text = self.metrics()
+        self.assertEqual(sample(
+            text, 'yatube_requests_total', view='index', status=200), 2)
+        self.assertEqual(sample(
+            text, 'yatube_request_duration_seconds_count', view='index'), 2)
+        self.assertGreater(
+            sample(text, 'yatube_db_queries_sum', view='index'), 0)
+        self.assertGreater(sample(
+            text, 'yatube_template_render_seconds_sum', view='index'), 0)
+        self.assertGreater(
+            sample(text, 'yatube_cache_hits_total', view='index'), 0)
+        self.assertGreater(
+            sample(text, 'yatube_cache_misses_total', view='index'), 0)
+
+    def test_buckets_are_cumulative(self):
+        """Интервалы гистограммы накопительные, +Inf равен count."""
+        self.client.get(reverse('index'))
+        text = self.metrics()
+        self.assertEqual(sample(
+            text, 'yatube_db_queries_bucket', view='index', le='+Inf'), 1)
+        self.assertEqual(sample(
+            text, 'yatube_db_queries_bucket', view='index', le=100), 1)
+
+    def test_workers_are_summed(self):
+        """Снимки других процессов из METRICS_DIR складываются."""
+        other = Registry()
+        other.inc('yatube_requests_total',
+                  (('view', 'index'), ('status', '200')), 5)
+        with tempfile.TemporaryDirectory() as directory:
+            # снимок живого процесса
+            path = os.path.join(directory, f'{os.getppid()}.json')
+            with open(path, 'w') as file:
+                json.dump(other.snapshot(), file)
+            with override_settings(METRICS_DIR=directory):
+                self.client.get(reverse('index'))
+                text = self.metrics()
+        self.assertEqual(sample(
+            text, 'yatube_requests_total', view='index', status=200), 6)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_are_not_public(self):
+        """Метрики видны только с разрешённых адресов."""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_dead_worker_is_skipped(self):
+        """Снимок завершившегося процесса не учитывается и убирается."""
+        worker = subprocess.Popen([sys.executable, '-c', ''])
+        worker.wait()
+        other = Registry()
+        other.inc('yatube_requests_total',
+                  (('view', 'index'), ('status', '200')), 5)
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, f'{worker.pid}.json'),
+                      'w') as file:
+                json.dump(other.snapshot(), file)
+            with override_settings(METRICS_DIR=directory):
+                self.client.get(reverse('index'))
+                text = self.metrics()
+                registry.remove()
+                self.assertFalse(os.path.exists(
+                    os.path.join(directory, f'{os.getpid()}.json')))
+        self.assertEqual(sample(
+            text, 'yatube_requests_total', view='index', status=200), 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_replaces_address_check(self):
+        """С METRICS_TOKEN метрики отдаются только по токену."""
+        self.assertEqual(
+            self.client.get(reverse('metrics')).status_code, 404)
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
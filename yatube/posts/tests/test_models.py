@@ -1,6 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, User, UserStats
 
 
 class PostModelTest(TestCase):
@@ -28,3 +32,72 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='CountersAuthor')
+        cls.reader = User.objects.create_user(username='CountersReader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """rebuild_counters восстанавливает разошедшиеся счётчики."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        UserStats.objects.filter(user=self.author).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+
+class FollowModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='FollowUser')
+        cls.authors = [
+            User.objects.create_user(username=f'FollowAuthor{number}')
+            for number in range(3)
+        ]
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена."""
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.user, author=self.authors[0])
+
+    def test_followed_authors_in_one_query(self):
+        """followed_authors отвечает для всех авторов одним запросом."""
+        Follow.objects.create(user=self.user, author=self.authors[1])
+        with self.assertNumQueries(1):
+            followed = Follow.objects.followed_authors(
+                self.user, [author.pk for author in self.authors])
+        self.assertEqual(followed, {self.authors[1].pk})
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube.profiling import HEADER, make_token
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(
+            username='profiling_staff', is_staff=True)
+        cls.author = User.objects.create_user(username='profiling_author')
+        Post.objects.create(text='Профиль', author=cls.author)
+        cls.url = reverse('profile', args=[cls.author.username])
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings = override_settings(PROFILING_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_signed_token_profiles_request(self):
+        """Запрос с токеном профилируется и попадает в сводку."""
+        response = self.staff_client.get(
+            self.url, **{HEADER: make_token(self.staff)})
+        sample_id = response['X-Profile-Id']
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, f'{sample_id}.prof')))
+        summary = self.staff_client.get(reverse('profiling'))
+        self.assertContains(summary, 'posts/views.py')
+        self.assertContains(summary, self.url)
+
+    def test_token_of_other_user_is_ignored(self):
+        """Токен сотрудника не действует в чужой сессии и без входа."""
+        token = make_token(self.staff)
+        other = Client()
+        other.force_login(self.author)
+        for client in (self.client, other):
+            with self.subTest(client=client):
+                response = client.get(self.url, **{HEADER: token})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('X-Profile-Id', response)
+
+    def test_bad_token_is_ignored(self):
+        """С поддельным токеном запрос обрабатывается как обычно."""
+        response = self.client.get(self.url, {'profile_token': 'forged'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MAX_SAMPLES=2)
+    def test_sampled_requests_are_pruned(self):
+        """Каждый N-й запрос профилируется, хранятся последние замеры."""
+        for _ in range(3):
+            self.assertTrue(
+                self.client.get(self.url).has_header('X-Profile-Id'))
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+    def test_viewer_is_staff_only(self):
+        """Сводка замеров закрыта от обычных пользователей."""
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, 302)
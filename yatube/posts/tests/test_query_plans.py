@@ -0,0 +1,97 @@
+import re
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# полный проход по таблице (не по индексу) или сортировка во временном дереве
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+def query_plan(sql):
+    # captured_queries хранит SQL с уже подставленными значениями
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'планы запросов SQLite')
+class QueryPlansTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='plans_author')
+        cls.reader = User.objects.create_user(username='plans_reader')
+        cls.group = Group.objects.create(
+            title='plans group',
+            slug='plans-group',
+            description='plans-group-description',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(15):
+            cls.post = Post.objects.create(
+                text=f'Планы запросов {number}',
+                author=cls.author, group=cls.group)
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_plans_use_indexes(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        if response['Content-Type'] == 'application/json':
+            next_cursor = response.json().get('next')
+        elif 'page' in response.context:
+            next_cursor = getattr(
+                response.context['page'].paginator, 'next_cursor', None)
+        else:
+            next_cursor = None
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for detail in query_plan(sql):
+                with self.subTest(url=url, sql=sql, plan=detail):
+                    self.assertNotRegex(detail, FULL_SCAN)
+                    self.assertNotRegex(detail, TEMP_SORT)
+        return next_cursor
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы каждой ленты идут по индексам, без сортировки."""
+        urls = (
+            reverse('index'),
+            reverse('groups', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('follow_index'),
+            reverse('api_index'),
+            reverse('api_group', args=[self.group.slug]),
+            reverse('api_profile', args=[self.author.username]),
+            reverse('api_follow'),
+        )
+        for url in urls:
+            next_cursor = self.assert_plans_use_indexes(url)
+            self.assert_plans_use_indexes(f'{url}?cursor={next_cursor}')
+
+    def test_post_queries_use_indexes(self):
+        """Страница поста и комментарии читаются по индексам."""
+        kwargs = {'username': self.author.username, 'post_id': self.post.id}
+        self.assert_plans_use_indexes(reverse('post', kwargs=kwargs))
+        self.assert_plans_use_indexes(reverse('post_comments', kwargs=kwargs))
+        self.assert_plans_use_indexes(reverse('api_post', args=[self.post.id]))
+
+    def test_search_queries_use_indexes(self):
+        """Поиск не сканирует таблицу постов."""
+        self.assert_plans_use_indexes(reverse('search') + '?q=планы')
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube.replicas import PIN_COOKIE, PRIMARY, ReplicaRouter
+
+from ..cards import card_key
+from ..models import Post, User
+from ..versions import GLOBAL, post_tag, version_key
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TestCase):
+    """Две базы: default — основная, replica — отстающая реплика.
+
+    Реплика не получает записей основной базы, так что по ленте видно,
+    откуда она прочитана.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        Post.objects.create(text='Пост в основной базе', author=self.author)
+        replica = User(pk=self.author.pk, username='writer')
+        User.objects.using('replica').bulk_create([replica])
+        Post.objects.using('replica').bulk_create(
+            [Post(text='Пост на реплике', author=replica)])
+        self.client = Client()
+
+    def settle(self):
+        """Версии ленты и постов старше REPLICA_LAG: реплика их догнала."""
+        tags = [GLOBAL, *(post_tag(pk) for pk in Post.objects.values_list(
+            'pk', flat=True))]
+        old = str(time.time_ns() - 60 * 10 ** 9)
+        cache.set_many({version_key(tag): old for tag in tags}, None)
+
+    def test_get_reads_replica(self):
+        """Чтения GET-запроса идут на реплику, записи — в основную базу."""
+        self.settle()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Пост на реплике')
+        self.assertNotContains(response, 'Пост в основной базе')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(ReplicaRouter().db_for_write(Post), PRIMARY)
+
+    def test_fresh_version_reads_primary(self):
+        """Только что изменённую ленту реплика ещё не догнала."""
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Пост в основной базе')
+
+    def test_writer_reads_own_writes(self):
+        """После записи автор читает основную базу, остальные — реплику."""
+        self.client.force_login(self.author)
+        response = self.client.post(reverse('new_post'),
+                                    {'text': 'Только что написанный'})
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'],
+                         settings.REPLICA_LAG)
+        self.settle()
+        response = Client().get(reverse('index'))
+        self.assertNotContains(response, 'Только что написанный')
+        self.settle()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Только что написанный')
+
+    def test_search_caches_fresh_card_from_primary(self):
+        """Поиск не кеширует карточку отставшей реплики под новой версией."""
+        url = reverse('search') + '?q=основной'
+        response = self.client.get(url)
+        self.assertContains(response, 'Пост в основной базе')
+        self.assertNotContains(response, 'Пост на реплике')
+        post = Post.objects.get()
+        version = cache.get(version_key(post_tag(post.pk)))
+        self.assertIn('Пост в основной базе',
+                      cache.get(card_key(post.pk, version)))
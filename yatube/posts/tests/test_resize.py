@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client, TestCase, override_settings
+from PIL import Image
+
+from .. import resize
+from ..resize import Spec, resize_url
+
+
+def picture(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+class ResizeTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        override = override_settings(IMAGE_CACHE_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        # счётчик объёма относится к прежнему каталогу кеша
+        resize._usage['bytes'] = None
+        self.path = default_storage.save('posts/resize.png',
+                                         picture(800, 600))
+        self.addCleanup(default_storage.delete, self.path)
+        self.client = Client()
+
+    def get_image(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = b''.join(response.streaming_content)
+        return response, Image.open(BytesIO(data))
+
+    def test_signed_url_returns_resized_image(self):
+        """Вариант нужного размера отдаётся с вечным кешированием."""
+        response, image = self.get_image(resize_url(self.path, 200))
+        self.assertEqual(image.size, (200, 150))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+        _, image = self.get_image(
+            resize_url(self.path, 100, 100, crop=True, format='webp'))
+        self.assertEqual((image.format, image.size), ('WEBP', (100, 100)))
+
+    def test_unsigned_params_are_rejected(self):
+        """Без верной подписи, за пределами posts/ и сверх размера — 404."""
+        url = resize_url(self.path, 200)
+        for address in (url.replace('200x0', '300x0'),
+                        url.replace(':', ':x'),
+                        resize_url('users/secret.png', 200),
+                        resize_url(self.path, 5000)):
+            with self.subTest(address=address):
+                self.assertEqual(self.client.get(address).status_code, 404)
+
+    def test_variant_is_built_once(self):
+        """Повторный запрос берёт вариант из кеша."""
+        url = resize_url(self.path, 200)
+        with mock.patch.object(resize, 'render',
+                               wraps=resize.render) as render:
+            self.get_image(url)
+            self.get_image(url)
+        render.assert_called_once()
+
+    def test_concurrent_requests_build_once(self):
+        """Одновременные запросы одного варианта строят его один раз."""
+        spec = Spec(200, 0, False, 'jpeg')
+        render = resize.render
+        start = threading.Barrier(2)
+        results = []
+
+        def slow_render(*args):
+            # второй поток успевает не найти файл и встать на блокировку
+            time.sleep(0.2)
+            return render(*args)
+
+        def request():
+            start.wait()
+            results.append(resize.variant(spec, self.path))
+
+        with mock.patch.object(resize, 'render',
+                               wraps=slow_render) as mocked:
+            threads = [threading.Thread(target=request) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        mocked.assert_called_once()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(results), 2)
+
+    def test_new_source_gets_new_variant(self):
+        """Изменённый исходный файл строится заново."""
+        spec = Spec(200, 0, False, 'jpeg')
+        first = resize.variant(spec, self.path)
+        default_storage.delete(self.path)
+        default_storage.save(self.path, picture(400, 100))
+        second = resize.variant(spec, self.path)
+        self.assertNotEqual(first, second)
+        with Image.open(second) as image:
+            self.assertEqual(image.size, (200, 50))
+
+    def test_eviction_keeps_cache_bounded(self):
+        """Переполненный кеш теряет давно не читанные варианты."""
+        first = resize.variant(Spec(300, 0, False, 'jpeg'), self.path)
+        os.utime(first, (0, 0))
+        size = os.path.getsize(first)
+        with override_settings(IMAGE_CACHE_MAX_SIZE=size * 3 // 2):
+            second = resize.variant(Spec(301, 0, False, 'jpeg'), self.path)
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.exists(second))
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+from ..search import matching_ids
+from ..stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        """Словоформы приводятся к одной основе."""
+        forms = {
+            'кошка': ('кошки', 'кошкой', 'кошку'),
+            'новость': ('новости', 'новостями'),
+            'красивый': ('красивые', 'красивейший'),
+        }
+        for word, variants in forms.items():
+            for variant in variants:
+                with self.subTest(variant=variant):
+                    self.assertEqual(stem(variant), stem(word))
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='search_author')
+        cls.cats = Post.objects.create(
+            text='Кошки любят спать на солнце', author=cls.author)
+        cls.dogs = Post.objects.create(
+            text='Собаки любят гулять', author=cls.author)
+        cls.both = Post.objects.create(
+            text='Кошка и кошка: про кошек и собак', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        return list(response.context['page'])
+
+    def test_search_matches_word_forms(self):
+        """Поиск находит посты с другими формами слова."""
+        self.assertCountEqual(self.search('кошкой'), [self.cats, self.both])
+
+    def test_search_ranks_by_relevance(self):
+        """Пост с большим числом совпадений идёт первым."""
+        self.assertEqual(self.search('кошка')[0], self.both)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.dogs.text = 'Теперь про попугаев'
+        self.dogs.save()
+        self.assertEqual(self.search('собака'), [self.both])
+        self.assertEqual(self.search('попугай'), [self.dogs])
+        self.dogs.delete()
+        self.assertEqual(matching_ids('попугай'), [])
+
+    def test_empty_query(self):
+        """Пустой запрос не ломает страницу."""
+        self.assertEqual(self.search('  '), [])
+
+    def test_unknown_database_falls_back_to_like(self):
+        """На базе без полнотекстового поиска посты ищутся подстрокой."""
+        with mock.patch.object(search, 'BACKENDS', {}):
+            Post.objects.create(text='Попугаи тоже любят', author=self.author)
+            found = [post.text for post in self.search('любят')]
+        self.assertEqual(found, ['Попугаи тоже любят', 'Собаки любят гулять',
+                                 'Кошки любят спать на солнце'])
@@ -0,0 +1,85 @@
+import io
+import shutil
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Comment, FeedEntry, Follow, Post, UserStats
+from ..search import matching_ids
+from ..seed import EPOCH, seed_database
+
+NOW = timezone.make_aware(datetime(2026, 1, 1))
+
+
+class Rollback(Exception):
+    pass
+
+
+class SeedTest(TestCase):
+    options = {'users': 40, 'posts': 300, 'follows_per_user': 5,
+               'groups': 3, 'chunk_size': 70, 'now': NOW}
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'author', 'group', 'image', 'pub_date')),
+            list(Follow.objects.order_by('pk').values_list(
+                'user', 'author')),
+            list(Comment.objects.order_by('pk').values_list(
+                'post', 'author', 'text', 'created')),
+        )
+
+    def test_same_seed_gives_same_data(self):
+        """Один и тот же seed даёт одни и те же данные."""
+        snapshots = []
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    seed_database(**self.options)
+                    snapshots.append(self.snapshot())
+                    raise Rollback
+            except Rollback:
+                pass
+        self.assertEqual(snapshots[0], snapshots[1])
+        self.assertEqual(len(snapshots[0][0]), 300)
+
+    def test_derived_data_is_rebuilt(self):
+        """Счётчики, ленты и поиск достраиваются после bulk_create."""
+        seed_database(**self.options)
+        # последний пост автора с подписчиками есть в их лентах
+        post = Post.objects.filter(author__following__isnull=False).order_by(
+            '-pub_date', '-pk').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        stats = UserStats.objects.get(user=post.author)
+        self.assertEqual(stats.posts_count, post.author.posts.count())
+        self.assertEqual(
+            stats.followers_count, post.author.following.count())
+        follow = Follow.objects.filter(author=post.author).first()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=follow.user_id, post=post).exists())
+        self.assertIn(post.pk, matching_ids(post.text, limit=10000))
+
+    def test_followers_are_skewed(self):
+        """Подписчики распределены неравномерно: есть явные лидеры."""
+        call_command('seed_scale', users=200, posts=10, follows_per_user=5,
+                     image_ratio=0, workers=1, stdout=io.StringIO())
+        counts = list(UserStats.objects.order_by(
+            '-followers_count').values_list('followers_count', flat=True))
+        self.assertGreater(counts[0], 10 * counts[len(counts) // 2])
+
+    def test_dates_do_not_depend_on_today(self):
+        """Без --now даты отсчитываются от постоянного момента."""
+        call_command('seed_scale', users=5, posts=20, follows_per_user=1,
+                     image_ratio=0, workers=1, stdout=io.StringIO())
+        latest = Post.objects.order_by('-pub_date').first().pub_date
+        self.assertLessEqual(latest, EPOCH)
+        self.assertGreater(latest, EPOCH - timedelta(days=365))
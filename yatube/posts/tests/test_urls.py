@@ -5,6 +5,8 @@ from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from users.forms import CreationForm
+
 from ..models import Group, Post
 
 User = get_user_model()
@@ -128,3 +130,16 @@ class TaskURLTests(TestCase):
         """Страница 404 отображается."""
         response = self.guest_client.get('/not-created-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_route_names_are_not_usernames(self):
+        """Имя, совпадающее с адресом сайта, при регистрации не принимается."""
+        for username, valid in (('search', False), ('new', False),
+                                ('img', False), ('api', False),
+                                ('searcher', True)):
+            form = CreationForm(data={
+                'username': username,
+                'password1': 'Sup3r-secret',
+                'password2': 'Sup3r-secret',
+            })
+            with self.subTest(username=username):
+                self.assertEqual(form.is_valid(), valid)
@@ -1,14 +1,21 @@
 import shutil
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.paginator import Paginator
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserStats
+from ..paginators import ELLIPSIS, elided_page_range
+from ..thumbnails import generate as generate_thumbnail
 
 User = get_user_model()
 
@@ -26,7 +33,7 @@ def post_correct_context(self, response):
     self.assertEqual(object_author, self.author)
     self.assertEqual(object_group, self.group)
     self.assertEqual(object_pub_date, self.post.pub_date)
-    self.assertEqual(object_image, 'posts/small.gif')
+    self.assertEqual(object_image, self.post.image)
 
 
 class PostPagesTests(TestCase):
@@ -69,6 +76,7 @@ class PostPagesTests(TestCase):
     @classmethod
     def tearDownClass(cls):
         shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(settings.IMAGE_CACHE_DIR, ignore_errors=True)
         super().tearDownClass()
 
     def setUp(self):
@@ -131,7 +139,7 @@ class PostPagesTests(TestCase):
         self.assertEqual(response_object.group, self.group)
         self.assertEqual(response_object.author, self.author)
         self.assertEqual(response_object.pub_date, self.post.pub_date)
-        self.assertEqual(response_object.image, 'posts/small.gif')
+        self.assertEqual(response_object.image, self.post.image)
 
     def test_new_page_shows_correct_context(self):
         """Шаблон new сформирован с правильным контекстом."""
@@ -208,6 +216,7 @@ class PostPagesTests(TestCase):
         self.assertNotIn(self.post, object)
 
     def test_cache_index_check(self):
+        """Карточка поста берётся из кеша до сохранения поста."""
         cache.clear()
         new_post = Post.objects.create(
             text='Тестовый кеш',
@@ -217,14 +226,88 @@ class PostPagesTests(TestCase):
         response_clear = self.authorized_client.get(reverse('index'))
         test_post_clear = response_clear.context['page'][0]
         self.assertEqual(test_post_clear, new_post)
-        Post.objects.filter(id=new_post.id).delete()
+        # update() не вызывает сигналы, карточка остаётся в кеше
+        Post.objects.filter(id=new_post.id).update(text='Без сигналов')
         response_cached = self.authorized_client.get(reverse('index'))
-        test_post_cached = response_cached.context
-        self.assertIsNone(test_post_cached)
-        cache.clear()
-        response_cleared = self.authorized_client.get(reverse('index'))
-        test_post_cleared = response_cleared.context['page'][0]
-        self.assertNotEqual(test_post_cleared, new_post)
+        self.assertContains(response_cached, 'Тестовый кеш')
+        new_post.text = 'Обновлённый текст'
+        new_post.save()
+        response_saved = self.authorized_client.get(reverse('index'))
+        self.assertContains(response_saved, 'Обновлённый текст')
+
+    def test_thumbnail_is_built_outside_request(self):
+        """До готовности миниатюры карточка показывает заглушку."""
+        response = self.guest_client.get(reverse('index'))
+        self.assertNotContains(response, '<img class="card-img"')
+        generate_thumbnail(self.post.id)
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnail)
+        self.assertEqual((self.post.image_width, self.post.image_height),
+                         (2, 1))
+        self.assertTrue(self.post.image_placeholder.startswith('data:'))
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, self.post.thumbnail)
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_stale_thumbnail_job_keeps_new_image(self):
+        """Задача для прежней картинки не портит размеры новой."""
+        def replace_image(spec, name):
+            Post.objects.filter(id=self.post.id).update(
+                image='posts/new.jpg', image_width=30, image_height=20)
+
+        with mock.patch('posts.thumbnails.variant',
+                        side_effect=replace_image):
+            generate_thumbnail(self.post.id)
+        post = Post.objects.get(id=self.post.id)
+        self.assertEqual((post.image_width, post.image_height), (30, 20))
+        self.assertEqual(post.thumbnail, '')
+
+    def test_new_image_resets_thumbnail(self):
+        """Замена картинки сбрасывает старую миниатюру."""
+        Post.objects.filter(id=self.post.id).update(
+            thumbnail='/old.jpg', image_width=2, image_height=1)
+        post = Post.objects.get(id=self.post.id)
+        post.image = SimpleUploadedFile(
+            name='other.gif', content=self.small_gif,
+            content_type='image/gif')
+        post.save()
+        self.assertEqual(post.thumbnail, '')
+        self.assertIsNone(post.image_width)
+
+    def test_cached_card_keeps_viewer_parts(self):
+        """Кнопка редактирования видна только автору и при общем кеше."""
+        edit_url = reverse(
+            'post_edit',
+            kwargs={'username': self.author, 'post_id': self.post.id})
+        response = self.authorized_client_2.get(reverse('index'))
+        self.assertContains(response, edit_url)
+        response = self.authorized_client.get(reverse('index'))
+        self.assertNotContains(response, edit_url)
+
+    def test_rename_refreshes_cached_card(self):
+        """Новое название группы и имя автора видны в карточке сразу."""
+        self.guest_client.get(reverse('index'))
+        # свои копии: объекты класса общие для всех тестов
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'renamed group'
+        group.save()
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'renamed_author'
+        author.save()
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, '#renamed group')
+        self.assertContains(response, '@renamed_author')
+
+    def test_group_delete_refreshes_cached_card(self):
+        """После удаления группы карточки её постов не ссылаются на неё."""
+        self.guest_client.get(reverse('index'))
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'doomed group'
+        group.save()
+        self.guest_client.get(reverse('index'))
+        group.delete()
+        response = self.guest_client.get(reverse('index'))
+        self.assertNotContains(response, '#doomed group')
 
 
 class PaginatorViewsTest(TestCase):
@@ -245,6 +328,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
 
     def test_first_page_contains_ten_records(self):
@@ -288,3 +372,350 @@ class PaginatorViewsTest(TestCase):
             reverse('profile',
                     kwargs={'username': self.author.username}) + '?page=3')
         self.assertEqual(len(response.context.get('page').object_list), 3)
+
+    def test_index_cursor_pages(self):
+        """Курсорная пагинация проходит ленту без пропусков и повторов."""
+        first = self.client.get(reverse('index')).context['page']
+        self.assertIsNone(first.paginator.previous_cursor)
+        second = self.client.get(
+            reverse('index') + f'?cursor={first.paginator.next_cursor}'
+        ).context['page']
+        self.assertEqual(len(second.object_list), 3)
+        self.assertIsNone(second.paginator.next_cursor)
+        self.assertEqual(
+            list(first.object_list) + list(second.object_list),
+            list(Post.objects.order_by('-pub_date', '-id')),
+        )
+        back = self.client.get(
+            reverse('index') + f'?cursor={second.paginator.previous_cursor}'
+        ).context['page']
+        self.assertEqual(list(back.object_list), list(first.object_list))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        response = self.client.get(reverse('index') + '?cursor=broken')
+        self.assertEqual(len(response.context['page'].object_list), 10)
+
+    @override_settings(PAGINATOR_MAX_PAGES=2)
+    def test_deep_page_is_capped(self):
+        """Слишком далёкий ?page= сводится к последней допустимой странице."""
+        page = self.client.get(
+            reverse('profile', kwargs={'username': self.author.username})
+            + '?page=100000').context['page']
+        self.assertEqual(page.number, 2)
+        self.assertEqual(page.paginator.num_pages, 2)
+
+    @override_settings(PAGINATOR_COUNT_THRESHOLD=5)
+    def test_large_count_is_cached(self):
+        """Число записей выше порога считается один раз."""
+        url = reverse('profile', kwargs={'username': self.author.username})
+        self.client.get(url + '?page=2')
+        Post.objects.create(text='Лишний', author=self.author)
+        page = self.client.get(url + '?page=3').context['page']
+        self.assertEqual(page.paginator.count, 13)
+
+    def test_page_links_are_elided(self):
+        """Ссылки пагинатора: края и окно вокруг текущей страницы."""
+        paginator = Paginator(range(200), 10)
+        self.assertEqual(
+            list(elided_page_range(paginator, 10)),
+            [1, ELLIPSIS, 8, 9, 10, 11, 12, ELLIPSIS, 20],
+        )
+        self.assertEqual(
+            list(elided_page_range(paginator, 1)),
+            [1, 2, 3, ELLIPSIS, 20],
+        )
+        self.assertEqual(
+            list(elided_page_range(Paginator(range(50), 10), 3)),
+            [1, 2, 3, 4, 5],
+        )
+
+    def test_gap_is_not_a_link(self):
+        """Пропуск в пагинаторе рисуется без ссылки."""
+        html = render_to_string('paginator.html', {
+            'page': Paginator(range(200), 10).page(10)})
+        self.assertInHTML('<span class="page-link">…</span>', html, count=2)
+        self.assertNotIn('page=…', html)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='queries_author')
+        cls.reader = User.objects.create_user(username='queries_reader')
+        cls.group = Group.objects.create(
+            title='queries group',
+            slug='queries-group',
+            description='queries-group-description',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_urls(self):
+        return (
+            reverse('index'),
+            reverse('groups', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('follow_index'),
+        )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return len(context.captured_queries)
+
+    def add_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=self.author, group=self.group)
+            Comment.objects.create(
+                post=post, author=self.reader, text='Комментарий')
+
+    def test_feed_query_count_does_not_depend_on_posts(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        self.add_posts(1)
+        expected = {url: self.count_queries(url) for url in self.feed_urls()}
+        self.add_posts(9)
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), expected[url])
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self, cursor=None):
+        url = reverse('follow_index')
+        if cursor:
+            url += f'?cursor={cursor}'
+        return self.client.get(url).context['page']
+
+    def test_follow_backfills_and_unfollow_prunes_feed(self):
+        """Подписка заполняет ленту, отписка её очищает."""
+        post = Post.objects.create(text='До подписки', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists())
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='После подписки', author=self.author)
+        self.assertEqual(list(self.feed().object_list), [post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1, FEED_PULL_EXIT_LIMIT=1)
+    def test_popular_author_posts_are_pulled(self):
+        """Посты популярного автора читаются без раскладки по лентам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        other = User.objects.create_user(username='feed_other')
+        Follow.objects.create(user=self.reader, author=other)
+        UserStats.objects.filter(user=other).update(followers_count=0,
+                                                    pull_mode=False)
+        for number in range(12):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        Post.objects.create(text='Ещё', author=other)
+        self.assertFalse(
+            FeedEntry.objects.filter(post__author=self.author).exists())
+
+        first = self.feed()
+        second = self.feed(first.paginator.next_cursor)
+        self.assertEqual(
+            list(first.object_list) + list(second.object_list),
+            list(Post.objects.order_by('-pub_date', '-id')),
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=3, FEED_PULL_EXIT_LIMIT=2)
+    def test_posts_from_pull_mode_stay_in_feed(self):
+        """Посты pull-режима остаются в ленте и после выхода из него."""
+        others = [User.objects.create_user(username=f'feed_leaving_{number}')
+                  for number in range(2)]
+        for user in (self.reader, *others):
+            Follow.objects.create(user=user, author=self.author)
+        pulled = Post.objects.create(text='В pull-режиме', author=self.author)
+        # ниже порога входа, но не ниже порога выхода: режим тот же
+        Follow.objects.filter(user=others[0]).delete()
+        self.assertTrue(UserStats.objects.get(user=self.author).pull_mode)
+        Follow.objects.filter(user=others[1]).delete()
+        self.assertFalse(UserStats.objects.get(user=self.author).pull_mode)
+        # по лентам посты pull-режима не раскладываются
+        self.assertFalse(FeedEntry.objects.filter(post=pulled).exists())
+        fanned = Post.objects.create(text='После выхода', author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=fanned).exists())
+        self.assertEqual(list(self.feed().object_list), [fanned, pulled])
+
+
+class FeedVersionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='versions_author')
+        cls.group = Group.objects.create(
+            title='versions group',
+            slug='versions-group',
+            description='versions-group-description',
+        )
+        cls.other_group = Group.objects.create(
+            title='other versions group',
+            slug='other-versions-group',
+            description='other-versions-group-description',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.post = Post.objects.create(
+            text='Версии', author=self.author, group=self.group)
+
+    def page(self, url):
+        return list(self.client.get(url).context['page'])
+
+    def test_warm_index_runs_no_queries(self):
+        """Повторный запрос ленты обходится без обращений к БД."""
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('index'))
+
+    def test_new_post_invalidates_cached_index(self):
+        """Новый пост сразу виден в закешированной ленте."""
+        self.page(reverse('index'))
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(self.page(reverse('index'))[0], new_post)
+
+    def test_group_change_invalidates_both_groups(self):
+        """Смена группы обновляет ленты старой и новой групп."""
+        old_url = reverse('groups', kwargs={'slug': self.group.slug})
+        new_url = reverse('groups', kwargs={'slug': self.other_group.slug})
+        self.assertEqual(self.page(old_url), [self.post])
+        self.assertEqual(self.page(new_url), [])
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertEqual(self.page(old_url), [])
+        self.assertEqual(self.page(new_url), [self.post])
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='comments_author')
+        cls.post = Post.objects.create(text='Обсуждение', author=cls.author)
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {n}')
+            for n in range(25)
+        ]
+        cls.url = reverse('post', kwargs={
+            'username': cls.author.username, 'post_id': cls.post.id})
+        cls.more_url = reverse('post_comments', kwargs={
+            'username': cls.author.username, 'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_shows_first_comments(self):
+        """На странице поста только первые комментарии, от старых к новым."""
+        comments = self.client.get(self.url).context['comments']
+        self.assertEqual(list(comments), self.comments[:20])
+        self.assertIsNotNone(comments.paginator.next_cursor)
+
+    def test_load_more_returns_next_comments(self):
+        """«Показать ещё» отдаёт следующую страницу в JSON."""
+        cursor = self.client.get(
+            self.url).context['comments'].paginator.next_cursor
+        data = self.client.get(self.more_url, {'cursor': cursor}).json()
+        self.assertEqual(
+            [item['id'] for item in data['comments']],
+            [comment.pk for comment in self.comments[20:]],
+        )
+        self.assertIsNone(data['next'])
+        self.assertIn('Комментарий 24', data['html'])
+
+    def test_post_page_cost_does_not_depend_on_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев."""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        for n in range(10):
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Ещё {n}')
+        cache.clear()
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.client.get(self.url)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.reader = User.objects.create_user(username='etag_reader')
+        cls.post = Post.objects.create(text='Условный GET', author=cls.author)
+        cls.urls = (
+            reverse('index'),
+            reverse('profile', args=[cls.author.username]),
+            reverse('post', args=[cls.author.username, cls.post.id]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def revalidate(self, url, response, queries=None):
+        headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+        if queries is None:
+            return self.client.get(url, **headers)
+        with self.assertNumQueries(queries):
+            return self.client.get(url, **headers)
+
+    def test_unchanged_page_is_not_rendered(self):
+        """Неизменённая страница отдаётся как 304 без основных запросов."""
+        for url, queries in zip(self.urls, (0, 1, 1)):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                again = self.revalidate(url, response, queries)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b'')
+
+    def test_if_modified_since(self):
+        """Поддерживается и If-Modified-Since."""
+        response = self.client.get(self.urls[0])
+        again = self.client.get(
+            self.urls[0],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_changes_invalidate_validators(self):
+        """Новый пост, комментарий и подписка дают новый ответ."""
+        responses = {url: self.client.get(url) for url in self.urls}
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый')
+        Follow.objects.create(user=self.reader, author=self.author)
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 200)
+
+    def test_viewers_get_own_etags(self):
+        """У каждого зрителя своя версия страницы."""
+        anonymous = self.client.get(self.urls[0])
+        self.client.force_login(self.reader)
+        self.assertEqual(
+            self.revalidate(self.urls[0], anonymous).status_code, 200)
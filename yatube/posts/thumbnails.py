@@ -0,0 +1,76 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from .images import preview
+from .models import Post
+from .resize import Spec, resize_url, variant
+from .versions import bump, post_feed_tags, post_tag
+
+# миниатюра карточки: 960×339, обрезка по центру
+SPEC = Spec(960, 339, True, 'jpeg')
+
+logger = logging.getLogger(__name__)
+executor = None
+
+
+def generate(post_id):
+    """Строит миниатюру поста и сохраняет её адрес в Post.thumbnail.
+
+    Миниатюра — вариант /img/ (posts/resize.py): здесь он заранее
+    кладётся в кеш, и первому читателю не придётся его ждать. Заодно
+    сохраняются размеры картинки и её заглушка.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    name = post.image.name
+    variant(SPEC, name)
+    with default_storage.open(name) as file:
+        width, height, placeholder = preview(file)
+    # картинку могли заменить, пока строилась миниатюра: у новой свои
+    # размеры и заглушка, а миниатюру для неё построит своя задача
+    updated = Post.objects.filter(pk=post.pk, image=name).update(
+        thumbnail=resize_url(name, *SPEC), image_width=width,
+        image_height=height, image_placeholder=placeholder)
+    # update() без сигналов: карточку и ленты сбрасываем сами
+    if updated:
+        bump(post_tag(post.pk), *post_feed_tags(post.author_id,
+                                                post.group_id))
+
+
+def build(post_id):
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру поста %s', post_id)
+
+
+def run(post_id):
+    try:
+        build(post_id)
+    finally:
+        connection.close()
+
+
+def enqueue(post_id):
+    """Ставит построение миниатюры в очередь фонового пула потоков.
+
+    При THUMBNAIL_WORKERS = 0 миниатюра строится сразу. Так же и с
+    базой SQLite в памяти (тесты): её нельзя делить между потоками.
+    """
+    global executor
+    in_memory = (connection.vendor == 'sqlite'
+                 and connection.is_in_memory_db())
+    if not settings.THUMBNAIL_WORKERS or in_memory:
+        build(post_id)
+        return
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    executor.submit(run, post_id)
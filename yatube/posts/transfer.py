@@ -0,0 +1,370 @@
+import gzip
+import json
+import sys
+from datetime import datetime
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .blobs import acquire, post_blobs
+from .counters import count_subquery
+from .feed import fill_feeds, update_pull_mode
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .search import rebuild_index
+from .resize import resize_url
+from .seed import batch_size, explicit_dates, reset_sequences
+from .thumbnails import SPEC
+from .versions import (GLOBAL, author_tag, bump, follow_tag, group_tag,
+                       post_tag)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Выгрузка и загрузка постов потоком JSONL (команды export_posts и
+# import_posts). Строка файла — одна запись {"model": ..., поля...};
+# внешние ключи на пользователей и группы записаны естественными
+# ключами (username, slug), а id постов и комментариев сохраняются.
+# Ни выгрузка, ни загрузка не держат в памяти больше одной пачки.
+CHUNK_SIZE = 2000
+# столько же значений уходит в каждый запрос field__in при загрузке
+BATCH_SIZE = 500
+
+# модель записи -> (модель, {поле записи: поле для values()})
+EXPORTS = {
+    'user': (User, {
+        'username': 'username',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'email': 'email',
+        'password': 'password',
+        'is_active': 'is_active',
+        'date_joined': 'date_joined',
+    }),
+    'group': (Group, {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    }),
+    'post': (Post, {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        # ссылки на файлы в MEDIA_ROOT, сами файлы переносятся отдельно
+        'image': 'image',
+        'image_variants': 'image_variants',
+        'image_width': 'image_width',
+        'image_height': 'image_height',
+        'image_placeholder': 'image_placeholder',
+    }),
+    'comment': (Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follow': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+class TransferError(ValueError):
+    pass
+
+
+def open_stream(path, mode):
+    """Текстовый поток файла path; сжатие выбирается по расширению.
+
+    '-' — стандартный ввод или вывод, .gz — gzip, .zst — zstd
+    (нужен пакет zstandard).
+    """
+    if path == '-':
+        stream = sys.stdin if 'r' in mode else sys.stdout
+        # закрытие обёртки не должно закрывать сам stdin/stdout
+        return open(stream.fileno(), mode, encoding='utf-8', closefd=False)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise TransferError('Для .zst нужен пакет zstandard')
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def encode(value):
+    # полная точность: DjangoJSONEncoder обрезает микросекунды,
+    # а от них зависит порядок постов с одинаковым временем
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не переводится в JSON')
+
+
+def fields_of(kind, record):
+    """Только известные поля записи: лишние (is_staff...) не грузятся."""
+    return {key: record[key] for key in EXPORTS[kind][1]}
+
+
+def export_records(chunk_size=CHUNK_SIZE):
+    """Записи всех моделей по порядку зависимостей.
+
+    iterator() читает таблицу пачками по chunk_size (в PostgreSQL —
+    серверным курсором), так что память не растёт с числом строк.
+    """
+    for name, (model, fields) in EXPORTS.items():
+        rows = model.objects.order_by('pk').values(*fields.values())
+        for row in rows.iterator(chunk_size=chunk_size):
+            record = {'model': name}
+            for key, path in fields.items():
+                record[key] = row[path]
+            if name == 'post':
+                record['image'] = record['image'] or None
+            yield record
+
+
+def export_to(stream, chunk_size=CHUNK_SIZE,
+              report=lambda kind, count: None):
+    """Пишет записи в stream, по строке JSON на запись; вернёт их число."""
+    counts = dict.fromkeys(EXPORTS, 0)
+    for record in export_records(chunk_size):
+        stream.write(json.dumps(record, default=encode, ensure_ascii=False))
+        stream.write('\n')
+        counts[record['model']] += 1
+        if counts[record['model']] % chunk_size == 0:
+            report(record['model'], counts[record['model']])
+    return counts
+
+
+def resolve(model, field, values):
+    """{значение field: pk} для значений пачки одним запросом."""
+    values = set(values) - {None}
+    found = dict(model.objects.filter(
+        **{f'{field}__in': values}).values_list(field, 'pk'))
+    missing = sorted(map(str, values - found.keys()))
+    if missing:
+        raise TransferError(
+            f'{model.__name__}: не найдены {", ".join(missing[:5])}')
+    return found
+
+
+def new_records(model, records, field='id'):
+    """Записи пачки, которых ещё нет в базе, без повторов внутри пачки."""
+    existing = set(model.objects.filter(
+        **{f'{field}__in': [record[field] for record in records]}
+    ).values_list(field, flat=True))
+    fresh = {}
+    for record in records:
+        if record[field] not in existing:
+            fresh.setdefault(record[field], record)
+    return list(fresh.values())
+
+
+def new_follows(follows):
+    """Новые подписки пачки: new_records по паре (подписчик, автор)."""
+    existing = set(Follow.objects.filter(
+        user_id__in={follow.user_id for follow in follows},
+        author_id__in={follow.author_id for follow in follows},
+    ).values_list('user_id', 'author_id'))
+    fresh = {}
+    for follow in follows:
+        pair = (follow.user_id, follow.author_id)
+        if pair not in existing:
+            fresh.setdefault(pair, follow)
+    return list(fresh.values())
+
+
+def feed_tags(posts):
+    """Теги лент, где видны посты posts, как у signals.bump_feeds."""
+    tags = {GLOBAL}
+    for author_id, group_id in posts.values_list('author_id', 'group_id'):
+        tags.add(author_tag(author_id))
+        if group_id is not None:
+            tags.add(group_tag(group_id))
+    return tags
+
+
+def bump_on_commit(*tags):
+    # иначе читатель успеет закешировать страницу без этой пачки
+    transaction.on_commit(lambda: bump(*tags))
+
+
+def load_users(records):
+    records = new_records(User, records, 'username')
+    users = [
+        User(**{**fields_of('user', record), 'date_joined': parse_datetime(
+            record['date_joined'])})
+        for record in records
+    ]
+    User.objects.bulk_create(users, batch_size=batch_size(User))
+    created = resolve(User, 'username',
+                      [record['username'] for record in records])
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in created.values()),
+        batch_size=batch_size(UserStats), ignore_conflicts=True)
+    return len(users)
+
+
+def load_groups(records):
+    records = new_records(Group, records, 'slug')
+    Group.objects.bulk_create((Group(**fields_of('group', record))
+                               for record in records),
+                              batch_size=batch_size(Group))
+    return len(records)
+
+
+def load_posts(records):
+    records = new_records(Post, records)
+    authors = resolve(User, 'username',
+                      [record['author'] for record in records])
+    groups = resolve(Group, 'slug', [record['group'] for record in records])
+    posts = [
+        Post(id=record['id'], text=record['text'],
+             pub_date=parse_datetime(record['pub_date']),
+             author_id=authors[record['author']],
+             group_id=groups.get(record['group']),
+             image=record['image'] or None,
+             image_variants=record.get('image_variants') or '',
+             image_width=record.get('image_width'),
+             image_height=record.get('image_height'),
+             image_placeholder=record.get('image_placeholder') or '')
+        for record in records
+    ]
+    for post in posts:
+        # bulk_create не ставит задачу на миниатюру: её адрес известен
+        # заранее, а сам вариант /img/ построит при первом запросе
+        if post.image and not post.image_variants:
+            post.thumbnail = resize_url(post.image.name, *SPEC)
+    # существующие записи уже отброшены new_records; если пачку
+    # параллельно загрузил кто-то ещё, она откатится целиком, и точные
+    # ссылки на файлы (acquire) не разойдутся с постами
+    with explicit_dates(Post):
+        Post.objects.bulk_create(posts, batch_size=batch_size(Post))
+    new = Post.objects.filter(pk__in=[post.pk for post in posts])
+    rebuild_index(new)
+    acquire(name for post in posts
+            for name in post_blobs(post.image.name, post.image_variants))
+    UserStats.objects.filter(user_id__in=set(authors.values())).update(
+        posts_count=count_subquery(Post.objects.all(), 'author', 'user'))
+    # подписки выгружаются после постов, так что при загрузке в пустую
+    # базу здесь нечего раскладывать; в заполненной это fan_out()
+    fill_feeds(Follow.objects.filter(author_id__in=set(authors.values())))
+    bump_on_commit(*feed_tags(new))
+    return len(posts)
+
+
+def load_comments(records):
+    records = new_records(Comment, records)
+    authors = resolve(User, 'username',
+                      [record['author'] for record in records])
+    post_ids = set(resolve(
+        Post, 'pk', [record['post'] for record in records]).values())
+    comments = [
+        Comment(id=record['id'], post_id=record['post'],
+                author_id=authors[record['author']], text=record['text'],
+                created=parse_datetime(record['created']))
+        for record in records
+    ]
+    with explicit_dates(Comment):
+        Comment.objects.bulk_create(comments, batch_size=batch_size(Comment))
+    posts = Post.objects.filter(pk__in=post_ids)
+    posts.update(comments_count=count_subquery(Comment.objects.all(), 'post'))
+    bump_on_commit(*feed_tags(posts), *(post_tag(pk) for pk in post_ids))
+    return len(comments)
+
+
+def load_follows(records):
+    users = resolve(User, 'username', (
+        username for record in records
+        for username in (record['user'], record['author'])))
+    follows = new_follows([Follow(user_id=users[record['user']],
+                                  author_id=users[record['author']])
+                           for record in records])
+    Follow.objects.bulk_create(follows, batch_size=batch_size(Follow))
+    stats = UserStats.objects.filter(user_id__in=set(users.values()))
+    stats.update(
+        followers_count=count_subquery(Follow.objects.all(), 'author', 'user'),
+        following_count=count_subquery(Follow.objects.all(), 'user', 'user'),
+    )
+    update_pull_mode(stats)
+    # ленты только новых подписок пачки, как backfill() при подписке
+    pairs = {(follow.user_id, follow.author_id) for follow in follows}
+    rows = Follow.objects.filter(
+        user_id__in={user_id for user_id, _ in pairs},
+        author_id__in={author_id for _, author_id in pairs},
+    ).values_list('pk', 'user_id', 'author_id')
+    fill_feeds(Follow.objects.filter(pk__in=[
+        pk for pk, *pair in rows if tuple(pair) in pairs]))
+    bump_on_commit(*{follow_tag(follow.user_id) for follow in follows},
+                   *{author_tag(follow.author_id) for follow in follows})
+    return len(follows)
+
+
+LOADERS = {
+    'user': load_users,
+    'group': load_groups,
+    'post': load_posts,
+    'comment': load_comments,
+    'follow': load_follows,
+}
+
+
+def load_batch(kind, records, first_line):
+    if not records:
+        return 0
+    try:
+        with transaction.atomic():
+            return LOADERS[kind](records)
+    except KeyError as error:
+        raise TransferError(
+            f'Строки {first_line}-{first_line + len(records) - 1}: '
+            f'в записи {kind} нет поля {error}')
+    except TransferError as error:
+        raise TransferError(
+            f'Строки {first_line}-{first_line + len(records) - 1}: {error}')
+
+
+def read_batches(lines, size):
+    """(модель, записи, номер первой строки) подряд идущих записей."""
+    kind, records, first_line = None, [], 1
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise TransferError(f'Строка {number}: это не JSON')
+        model = record.pop('model', None)
+        if model not in LOADERS:
+            raise TransferError(f'Строка {number}: неизвестная модель {model}')
+        if model != kind or len(records) >= size:
+            yield kind, records, first_line
+            kind, records, first_line = model, [], number
+        records.append(record)
+    yield kind, records, first_line
+
+
+def import_from(stream, batch=BATCH_SIZE,
+                report=lambda kind, count: None):
+    """Загружает записи из stream пачками bulk_create.
+
+    Каждая пачка — своя транзакция: внешние ключи пачки разрешаются
+    одним запросом на модель, счётчики затронутых строк пересчитываются
+    сразу, а версии их лент сдвигаются. Уже существующие записи
+    пропускаются, поэтому прерванную загрузку можно просто повторить.
+    Ленты подписок достраиваются с каждой пачкой постов и подписок.
+    Вернёт {модель: создано}.
+    """
+    counts = dict.fromkeys(LOADERS, 0)
+    for kind, records, first_line in read_batches(stream, batch):
+        created = load_batch(kind, records, first_line)
+        if records:
+            counts[kind] += created
+            report(kind, created)
+    reset_sequences((Post, Comment))
+    bump(GLOBAL)
+    return counts
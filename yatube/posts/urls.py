@@ -1,12 +1,21 @@
 from django.urls import path
 
-from . import views
+from . import api, resize, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='groups'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post, name='api_post'),
+    path('api/groups/<slug:slug>/posts/', api.group_posts,
+         name='api_group'),
+    path('api/users/<str:username>/posts/', api.profile,
+         name='api_profile'),
+    path('api/follow/', api.follow_index, name='api_follow'),
+    path('img/<str:signed>/<path:path>', resize.resize, name='resize'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
@@ -14,6 +23,8 @@ urlpatterns = [
         views.post_edit,
         name='post_edit'
     ),
+    path('<str:username>/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('<username>/<int:post_id>/comment',
          views.add_comment, name='add_comment'),
     path('<str:username>/follow/', views.profile_follow,
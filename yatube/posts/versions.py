@@ -0,0 +1,89 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from yatube.metrics import record_cache
+from yatube.replicas import use_primary
+
+GLOBAL = 'global'
+
+
+def group_tag(group_id):
+    return f'group:{group_id}'
+
+
+def author_tag(author_id):
+    return f'author:{author_id}'
+
+
+def follow_tag(user_id):
+    return f'follow:{user_id}'
+
+
+def post_tag(post_id):
+    return f'post:{post_id}'
+
+
+def post_feed_tags(author_id, group_id):
+    """Теги лент, где виден пост: общей, автора и группы."""
+    tags = [GLOBAL, author_tag(author_id)]
+    if group_id is not None:
+        tags.append(group_tag(group_id))
+    return tags
+
+
+def version_key(tag):
+    return f'version:{tag}'
+
+
+def new_version():
+    return str(time.time_ns())
+
+
+def get_versions(tags):
+    """Словарь {тег: версия} одним get_many.
+
+    Вытесненной версии назначается новая: значения, закешированные
+    под неизвестной версией, переиспользоваться не должны. Свежая
+    версия переключает чтения запроса на основную базу.
+    """
+    found = cache.get_many([version_key(tag) for tag in tags])
+    record_cache(len(found), len(tags) - len(found))
+    versions = {}
+    for tag in tags:
+        version = found.get(version_key(tag))
+        if version is None:
+            version = new_version()
+            if not cache.add(version_key(tag), version, None):
+                version = cache.get(version_key(tag), version)
+        versions[tag] = version
+    # изменение младше REPLICA_LAG реплика могла ещё не получить: такая
+    # страница читается с основной базы, иначе под новой версией
+    # закешировалось бы старое содержимое
+    if any(map(is_recent, versions.values())):
+        use_primary()
+    return versions
+
+
+def is_recent(version):
+    """Версия моложе REPLICA_LAG: реплика могла её ещё не догнать."""
+    return int(version) > time.time_ns() - settings.REPLICA_LAG * 10 ** 9
+
+
+def bump(*tags):
+    """Сдвигает версии тегов, делая устаревшими все зависящие ключи."""
+    version = new_version()
+    cache.set_many({version_key(tag): version for tag in tags}, None)
+
+
+def versioned_key(name, tags, *parts):
+    """Ключ кеша для name, меняющийся вместе с версией любого из тегов.
+
+    После bump() старый ключ больше не запрашивается, поэтому значения
+    можно хранить часами: устаревшие просто вытесняются по времени.
+    """
+    versions = get_versions(tags)
+    raw = '|'.join([*parts, *(f'{tag}={versions[tag]}' for tag in tags)])
+    return f'{name}:{hashlib.md5(raw.encode()).hexdigest()}'
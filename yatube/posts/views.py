@@ -1,52 +1,130 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
 
+from .cards import attach_cards
+from .conditional import conditional
+from .feed import FeedPaginator
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginators import CommentPaginator, NumberedPaginator, paginate
+from .search import SearchResults
+from .versions import GLOBAL, author_tag, follow_tag, group_tag, post_tag
 
+COMMENTS_PER_PAGE = 20
 
-@cache_page(20)
+
+def feed_context(request, page, **context):
+    """Контекст ленты: карточки из кеша и подписки зрителя на авторов."""
+    attach_cards(page)
+    followed = Follow.objects.followed_authors(
+        request.user, (post.author_id for post in page))
+    return {'page': page, 'followed': followed, **context}
+
+
+def comments_page(request, post):
+    """Страница комментариев поста по курсору ?cursor= вместе с авторами."""
+    comments = post.comments.select_related('author')
+    paginator = CommentPaginator(comments, COMMENTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def author_tags(author_id):
+    # посты, счётчики постов и подписчиков автора и его подписки
+    return [author_tag(author_id), follow_tag(author_id)]
+
+
+def group_tags(request, slug):
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    return None if pk is None else [group_tag(pk)]
+
+
+def profile_tags(request, username):
+    pk = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    return None if pk is None else author_tags(pk)
+
+
+def post_tags(request, username, post_id):
+    author_id = Post.objects.filter(
+        pk=post_id, author__username=username,
+    ).order_by().values_list('author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return [post_tag(post_id), *author_tags(author_id)]
+
+
+@conditional(lambda request: [GLOBAL])
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page, })
+    post_list = Post.objects.for_feed()
+    page = paginate(request, post_list, 10, tags=[GLOBAL])
+    return render(request, 'index.html', feed_context(request, page))
 
 
+@conditional(group_tags)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    group_list = group.posts.all()
-    paginator = Paginator(group_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'group.html',
-                  {'page': page, 'group': group, 'posts': group_list})
+    group_list = group.posts.for_feed()
+    page = paginate(request, group_list, 10, tags=[group_tag(group.pk)])
+    return render(request, 'group.html', feed_context(
+        request, page, group=group, posts=group_list))
 
 
+@conditional(profile_tags)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     user = request.user
-    posts = Post.objects.filter(author=author)
+    posts = Post.objects.for_feed().filter(author=author)
     following = user.is_authenticated and (Follow.objects.filter(user=user,
                                            author=author).exists())
-    paginator = Paginator(posts, 5)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, posts, 5, tags=[author_tag(author.pk)])
+    attach_cards(page)
     return render(request, 'profile.html',
                   {'author': author, 'page': page, 'following': following})
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = NumberedPaginator(SearchResults(query), 10)
+    page = paginator.get_page(request.GET.get('page'))
+    return render(request, 'search.html', feed_context(
+        request, page, query=query,
+        page_query=urlencode({'q': query}) + '&'))
+
+
+@conditional(post_tags)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__stats'),
+        author__username=username, pk=post_id)
+    attach_cards([post])
+    comments = comments_page(request, post)
     form = CommentForm()
     return render(request, 'post.html',
                   {'post': post, 'comments': comments, 'form': form})
 
 
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(
+        Post.objects.only('pk'), author__username=username, pk=post_id)
+    comments = comments_page(request, post)
+    return JsonResponse({
+        'comments': [{
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created,
+        } for comment in comments],
+        'html': render_to_string(
+            'comment_list.html', {'comments': comments}, request),
+        'next': comments.paginator.next_cursor,
+    })
+
+
 @login_required
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -85,11 +163,14 @@ def add_comment(request, username, post_id):
 
 
 @login_required
+@conditional(lambda request: [GLOBAL])
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed().filter(
+        author__following__user=request.user)
+    page = paginate(request, post_list, 10, FeedPaginator,
+                    tags=[GLOBAL, follow_tag(request.user.pk)],
+                    user=request.user)
+    attach_cards(page)
     return render(request, 'follow.html',
                   {'page': page})
 
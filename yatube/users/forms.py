@@ -1,10 +1,50 @@
+from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.urls import URLResolver, get_resolver, resolve, reverse
+from django.urls.converters import IntConverter
 
 User = get_user_model()
 
 
+def username_routes(patterns=None, namespace=''):
+    """(имя маршрута, пример параметров) всех адресов с username."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = (f'{namespace}{pattern.namespace}:' if pattern.namespace
+                      else namespace)
+            yield from username_routes(pattern.url_patterns, prefix)
+            continue
+        converters = getattr(pattern.pattern, 'converters', {})
+        if pattern.name and 'username' in converters:
+            yield namespace + pattern.name, {
+                name: '1' if isinstance(converter, IntConverter) else 'x'
+                for name, converter in converters.items()
+            }
+
+
+def is_reserved(username):
+    """Один из адресов пользователя достаётся другому маршруту сайта.
+
+    Например, у пользователя api адрес api/follow/ занят API, а у img
+    адрес img/1/edit/ — картинками.
+    """
+    for name, kwargs in username_routes():
+        address = reverse(name, kwargs={**kwargs, 'username': username})
+        if resolve(address).view_name != name:
+            return True
+    return False
+
+
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if is_reserved(username):
+            raise forms.ValidationError('Это имя занято адресом сайта.')
+        return username
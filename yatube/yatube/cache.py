@@ -0,0 +1,148 @@
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MISSING = object()
+
+
+class TwoTierCache(BaseCache):
+    """Небольшой LRU в памяти процесса перед общим кешем.
+
+    LOCATION — алиас общего кеша из CACHES. Локально хранятся ключи
+    с префиксами из OPTIONS['IMMUTABLE_PREFIXES'] — значения под ними
+    не меняются (ключи строятся из версий), поэтому их можно держать
+    до истечения срока. Прочие ключи, например сами версии, кешируются
+    локально не дольше OPTIONS['LOCAL_TIMEOUT'] секунд (по умолчанию
+    нисколько), иначе инвалидация между процессами не работала бы.
+    Размер локального уровня ограничен MAX_ENTRIES.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._immutable_prefixes = tuple(
+            options.get('IMMUTABLE_PREFIXES', ()))
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 0)
+        self._local = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_expiry(self, key, timeout):
+        if key.startswith(self._immutable_prefixes):
+            return self.get_backend_timeout(timeout)
+        if not self._local_timeout:
+            return False
+        expiry = time.time() + self._local_timeout
+        shared_expiry = self.get_backend_timeout(timeout)
+        if shared_expiry is not None:
+            expiry = min(expiry, shared_expiry)
+        return expiry
+
+    def _local_get(self, key, version):
+        local_key = self.make_key(key, version=version)
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return MISSING
+            pickled, expiry = entry
+            if expiry is not None and expiry <= time.time():
+                del self._local[local_key]
+                return MISSING
+            self._local.move_to_end(local_key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout, version):
+        expiry = self._local_expiry(key, timeout)
+        if expiry is False:
+            return
+        local_key = self.make_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._local[local_key] = (pickled, expiry)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key, version):
+        with self._lock:
+            self._local.pop(self.make_key(key, version=version), None)
+
+    def get(self, key, default=None, version=None):
+        value = self._local_get(key, version)
+        if value is not MISSING:
+            return value
+        value = self.shared.get(key, MISSING, version=version)
+        if value is MISSING:
+            return default
+        # срок жизни в общем кеше неизвестен, берём умолчание
+        self._local_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            value = self._local_get(key, version)
+            if value is MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            for key, value in fetched.items():
+                self._local_set(key, value, DEFAULT_TIMEOUT, version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._local_set(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(key, version)
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self.shared.incr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(key, version)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(key, version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return (self._local_get(key, version) is not MISSING
+                or self.shared.has_key(key, version=version))
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
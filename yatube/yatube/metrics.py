@@ -0,0 +1,283 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.template.backends.django import DjangoTemplates, Template
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+COUNTERS = {
+    'yatube_requests_total': 'Ответы по представлениям и статусам',
+    'yatube_cache_hits_total': 'Попадания в кеш',
+    'yatube_cache_misses_total': 'Промахи мимо кеша',
+}
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время ответа', LATENCY_BUCKETS),
+    'yatube_db_queries': (
+        'SQL-запросов на ответ', QUERY_BUCKETS),
+    'yatube_db_duration_seconds': (
+        'Время SQL-запросов ответа', LATENCY_BUCKETS),
+    'yatube_template_render_seconds': (
+        'Время отрисовки шаблонов ответа', LATENCY_BUCKETS),
+}
+
+
+class Registry:
+    """Счётчики и гистограммы процесса.
+
+    Гистограмма хранится как [число в каждом интервале..., сумма],
+    последний интервал — +Inf. Метки — кортеж пар (имя, значение).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = 0
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        index = next((number for number, bound in enumerate(buckets)
+                      if value <= bound), len(buckets))
+        key = (name, labels)
+        with self.lock:
+            row = self.histograms.get(key)
+            if row is None:
+                row = self.histograms[key] = [0] * (len(buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value
+                             in self.counters.items()],
+                'histograms': [[name, labels, list(row)] for (name, labels),
+                               row in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """Сбрасывает снимок в METRICS_DIR не чаще METRICS_FLUSH_INTERVAL."""
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (
+                not force
+                and now - self.flushed < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.flushed = now
+        os.makedirs(directory, exist_ok=True)
+        descriptor, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path, snapshot_path(os.getpid()))
+
+    def remove(self):
+        """Убирает снимок процесса при выходе.
+
+        Иначе его pid может занять новый воркер и получить старые счётчики.
+        """
+        if settings.METRICS_DIR:
+            try:
+                os.remove(snapshot_path(os.getpid()))
+            except FileNotFoundError:
+                pass
+
+
+def snapshot_path(pid):
+    return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # процесс есть, но чужой
+        pass
+    return True
+
+
+registry = Registry()
+atexit.register(registry.remove)
+
+# счётчики текущего запроса: у каждого потока свои
+_request = threading.local()
+
+
+def record_cache(hits, misses):
+    """Попадания и промахи кеша в пределах текущего запроса."""
+    if getattr(_request, 'active', False):
+        _request.cache_hits += hits
+        _request.cache_misses += misses
+
+
+def count_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        _request.queries += 1
+        _request.db_time += time.perf_counter() - started
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        if not getattr(_request, 'active', False) or _request.rendering:
+            return super().render(context, request)
+        # вложенные render_to_string уже учтены во внешнем шаблоне
+        _request.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            _request.rendering = False
+            _request.render_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django с замером времени отрисовки для метрик."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self)
+
+
+class MetricsMiddleware:
+    """Время ответа, SQL, кеш и шаблоны по имени URL для /metrics.
+
+    На запрос приходится несколько вызовов perf_counter и одно
+    обновление словарей под блокировкой, так что её можно не выключать.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _request.__dict__.update(
+            active=True, queries=0, db_time=0.0, cache_hits=0,
+            cache_misses=0, render_time=0.0, rendering=False)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(count_query))
+                response = self.get_response(request)
+        finally:
+            _request.active = False
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (('view', match.view_name if match else 'unresolved'),)
+        registry.inc('yatube_requests_total',
+                     view + (('status', str(response.status_code)),))
+        registry.observe('yatube_request_duration_seconds', view, elapsed)
+        registry.observe('yatube_db_queries', view, _request.queries)
+        registry.observe('yatube_db_duration_seconds', view, _request.db_time)
+        registry.observe('yatube_template_render_seconds', view,
+                         _request.render_time)
+        if _request.cache_hits:
+            registry.inc('yatube_cache_hits_total', view, _request.cache_hits)
+        if _request.cache_misses:
+            registry.inc('yatube_cache_misses_total', view,
+                         _request.cache_misses)
+        registry.flush()
+        return response
+
+
+def collect():
+    """Сумма снимков всех процессов из METRICS_DIR и текущего процесса."""
+    snapshots = [registry.snapshot()]
+    if settings.METRICS_DIR:
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            pid = os.path.basename(path)[:-len('.json')]
+            # снимок убитого воркера, который не успел его убрать
+            if not pid.isdigit() or int(pid) == os.getpid() or (
+                    not is_alive(int(pid))):
+                continue
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, row in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(row))
+            for index, value in enumerate(row):
+                total[index] += value
+    return counters, histograms
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def exposition():
+    """Текст в формате Prometheus text exposition 0.0.4."""
+    counters, histograms = collect()
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{format_labels(labels)} {value}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (metric, labels), row in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), row):
+                cumulative += count
+                lines.append(f'{name}_bucket'
+                             f'{format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {row[-1]}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def is_allowed(request):
+    """Доступ к /metrics: по METRICS_TOKEN, если он задан, иначе по адресу.
+
+    За обратным прокси REMOTE_ADDR — всегда адрес прокси, поэтому там
+    нужен токен в заголовке Authorization: Bearer <токен>.
+    """
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.META.get(
+            'HTTP_AUTHORIZATION', '').partition(' ')
+        return scheme.lower() == 'bearer' and constant_time_compare(
+            token, settings.METRICS_TOKEN)
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    if not is_allowed(request):
+        raise Http404
+    return HttpResponse(exposition(),
+                        content_type='text/plain; version=0.0.4')
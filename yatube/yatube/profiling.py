@@ -0,0 +1,179 @@
+import cProfile
+import glob
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core import signing
+from django.shortcuts import render
+
+SALT = 'yatube.profiling'
+HEADER = 'HTTP_X_PROFILE_TOKEN'
+PARAM = 'profile_token'
+TOP = 30
+# cProfile и tracemalloc общие на процесс: одновременно — один запрос
+_lock = threading.Lock()
+
+
+def make_token(user):
+    """Подписанный токен профилирования, выдаётся сотруднику."""
+    return signing.dumps({'user': user.pk}, salt=SALT)
+
+
+def valid_token(token, user):
+    """Токен подписан, не просрочен и выдан именно пользователю user."""
+    try:
+        payload = signing.loads(token, salt=SALT,
+                                max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return user.is_authenticated and payload.get('user') == user.pk
+
+
+def wanted(request):
+    """Профилировать ли запрос: по токену или 1 из PROFILING_SAMPLE_RATE."""
+    token = request.META.get(HEADER) or request.GET.get(PARAM)
+    if token:
+        return valid_token(token, request.user)
+    rate = settings.PROFILING_SAMPLE_RATE
+    return bool(rate) and random.randrange(rate) == 0
+
+
+def prune(directory):
+    """Оставляет не больше PROFILING_MAX_SAMPLES последних замеров."""
+    samples = sorted(glob.glob(os.path.join(directory, '*.json')))
+    for path in samples[:-settings.PROFILING_MAX_SAMPLES or None]:
+        for name in (path, path[:-len('.json')] + '.prof'):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+
+def save(request, profiler, allocations, elapsed):
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    match = request.resolver_match
+    sample_id = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+    base = os.path.join(directory, sample_id)
+    profiler.dump_stats(base + '.prof')
+    meta = {
+        'id': sample_id,
+        'path': request.get_full_path(),
+        'view': match.view_name if match else None,
+        'module': match.func.__module__ if match else None,
+        'seconds': elapsed,
+        'allocations': [
+            {'line': str(stat.traceback), 'size': stat.size,
+             'count': stat.count}
+            for stat in allocations.statistics('lineno')[:TOP]
+        ],
+    }
+    # .json пишется последним: по нему viewer узнаёт готовый замер
+    with open(base + '.json', 'w') as file:
+        json.dump(meta, file, ensure_ascii=False)
+    prune(directory)
+    return sample_id
+
+
+class ProfilingMiddleware:
+    """Профилирует выбранные запросы: cProfile и снимок tracemalloc.
+
+    Запрос выбирается подписанным токеном (заголовок X-Profile-Token
+    или ?profile_token=) того же вошедшего пользователя, которому он
+    выдан, либо случайно, 1 из PROFILING_SAMPLE_RATE.
+    Замеры складываются в PROFILING_DIR, сводку показывает profiling().
+    Остальные запросы платят только за проверку условий.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not wanted(request) or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            _lock.release()
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            elapsed = time.perf_counter() - started
+            allocations = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        response['X-Profile-Id'] = save(
+            request, profiler, allocations, elapsed)
+        return response
+
+
+def load_samples(module):
+    samples = []
+    pattern = os.path.join(settings.PROFILING_DIR, '*.json')
+    for path in sorted(glob.glob(pattern), reverse=True):
+        try:
+            with open(path) as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if not module or meta['module'] == module:
+            samples.append(meta)
+    return samples
+
+
+def top_functions(samples, sort):
+    """Функции, суммарно по всем замерам, по убыванию sort."""
+    paths = [os.path.join(settings.PROFILING_DIR, f'{meta["id"]}.prof')
+             for meta in samples]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return []
+    stats = pstats.Stats(*paths).stats
+    rows = [
+        {'function': f'{filename}:{line}({name})', 'calls': calls,
+         'tottime': tottime, 'cumtime': cumtime}
+        for (filename, line, name), (_, calls, tottime, cumtime, _)
+        in stats.items()
+    ]
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:TOP]
+
+
+def top_allocations(samples):
+    total = {}
+    for meta in samples:
+        for stat in meta['allocations']:
+            total[stat['line']] = total.get(stat['line'], 0) + stat['size']
+    return sorted(total.items(), key=lambda item: item[1], reverse=True)[:TOP]
+
+
+@staff_member_required
+def profiling(request):
+    """Сводка замеров: самые дорогие функции и строки с выделениями."""
+    module = request.GET.get('module', 'posts.views')
+    sort = request.GET.get('sort')
+    if sort not in ('tottime', 'cumtime', 'calls'):
+        sort = 'cumtime'
+    samples = load_samples(module)
+    return render(request, 'misc/profiling.html', {
+        'module': module,
+        'sort': sort,
+        'samples': samples[:TOP],
+        'count': len(samples),
+        'functions': top_functions(samples, sort),
+        'allocations': top_allocations(samples),
+        'token': make_token(request.user),
+        'param': PARAM,
+    })
@@ -0,0 +1,71 @@
+import random
+import threading
+
+from django.conf import settings
+
+# Чтение с реплик: GET-запросы читают с одной из DATABASE_REPLICAS,
+# записи и всё, что запрос читает после своей записи, идут в основную
+# базу. Кто записывал, получает куку PIN_COOKIE и REPLICA_LAG секунд
+# читает основную базу: свой пост он видит сразу (read-your-writes).
+# Вне запросов (команды, фоновые потоки) всё идёт в основную базу.
+PRIMARY = 'default'
+PIN_COOKIE = 'pin_primary'
+# кеш на базе (CACHE_BACKEND = 'db') читается только с основной:
+# версии тегов с отстающей реплики были бы старыми
+CACHE_APP_LABEL = 'django_cache'
+
+_state = threading.local()
+
+
+def use_primary():
+    """Оставшиеся чтения этого запроса — с основной базы."""
+    _state.replica = None
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return PRIMARY
+        return getattr(_state, 'replica', None) or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        # без явного ответа Django пишет туда, откуда прочитан объект
+        if model._meta.app_label != CACHE_APP_LABEL:
+            _state.wrote = True
+            use_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # все базы DATABASES — основная и её реплики, данные в них те же
+        if {obj1._state.db, obj2._state.db} <= set(settings.DATABASES):
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтений запроса и ставит куку после записи.
+
+    Стоит до SessionMiddleware: сохранение сессии — тоже запись.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = settings.DATABASE_REPLICAS
+        pinned = PIN_COOKIE in request.COOKIES
+        _state.wrote = False
+        _state.replica = None
+        if replicas and request.method in ('GET', 'HEAD') and not pinned:
+            _state.replica = random.choice(replicas)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.replica = None
+            _state.wrote = False
+        if replicas and wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_LAG,
+                                httponly=True, samesite='Lax')
+        return response
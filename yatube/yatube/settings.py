@@ -17,32 +17,81 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
-CACHES = {
-    'default': {
+# Общий для всех процессов кеш: locmem (по умолчанию, у каждого процесса
+# свой), file или db (SQLite, нужен `manage.py createcachetable`),
+# memcached или redis (нужен django-redis). Адрес — в CACHE_LOCATION.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_LOCATION or os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': CACHE_LOCATION or 'yatube_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': CACHE_LOCATION or '127.0.0.1:11211',
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+    },
 }
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+# Двухуровневый режим: LRU в памяти процесса перед общим кешем.
+# Локально живут только неизменяемые ключи карточек и страниц лент.
+if os.environ.get('CACHE_LOCAL_TIER'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.TwoTierCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000,
+                'IMMUTABLE_PREFIXES': ['post_card:', 'feed_page:'],
+            },
+        },
+        'shared': CACHE_BACKENDS[CACHE_BACKEND],
+    }
+
+# Карточки постов инвалидируются сигналами, срок жизни лишь ограничивает
+# объём кеша.
+POST_CARD_TIMEOUT = 60 * 60 * 24
+# Страницы лент кешируются под версиями тегов (posts/versions.py)
+# и инвалидируются сигналами, поэтому могут жить часами.
+FEED_PAGE_TIMEOUT = 60 * 60 * 6
 
 INSTALLED_APPS = [
     'about',
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -53,7 +102,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -76,6 +125,18 @@ DATABASES = {
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
+# Реплики только для чтения (yatube/replicas.py): алиасы из DATABASES
+# через запятую в DATABASE_REPLICAS. Локально replica — второе
+# соединение с тем же файлом SQLite: маршрутизация та же, только без
+# отставания; в тестах это отдельная база. REPLICA_LAG — с запасом,
+# на сколько секунд реплика может отстать от основной базы.
+DATABASES['replica'] = dict(DATABASES['default'])
+DATABASE_REPLICAS = [
+    alias for alias in os.environ.get('DATABASE_REPLICAS', '').split(',')
+    if alias
+]
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+REPLICA_LAG = 5
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,6 +169,67 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Посты авторов с таким числом подписчиков не раскладываются по лентам
+# подписок при публикации, а подтягиваются при чтении ленты.
+FEED_FANOUT_LIMIT = 10000
+# Выходит из pull-режима автор, у которого подписчиков стало меньше этого.
+FEED_PULL_EXIT_LIMIT = 8000
+# Сколько последних постов автора попадает в ленту сразу после подписки.
+FEED_BACKFILL_LIMIT = 1000
+
+# Потоки фоновой генерации миниатюр; 0 — строить сразу при сохранении.
+THUMBNAIL_WORKERS = 2
+
+# Картинки постов из PostForm (posts/images.py). Файл больше
+# IMAGE_MAX_UPLOAD_SIZE байт или картинка больше IMAGE_MAX_PIXELS точек
+# отклоняются. Остальные перекодируются без метаданных в IMAGE_FORMATS,
+# которые умеет Pillow, и в JPEG, каждая ширины из IMAGE_WIDTHS.
+# Исходный файл сохраняется только при IMAGE_KEEP_ORIGINAL.
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_WIDTHS = (320, 640, 960, 1280)
+IMAGE_FORMATS = ('avif', 'webp')
+IMAGE_QUALITY = 80
+IMAGE_KEEP_ORIGINAL = False
+
+# Картинки нужного размера по запросу (posts/resize.py) на /img/.
+# Готовые варианты лежат в IMAGE_CACHE_DIR; когда их больше
+# IMAGE_CACHE_MAX_SIZE байт, удаляются давно не читанные.
+IMAGE_CACHE_DIR = os.environ.get(
+    'IMAGE_CACHE_DIR', os.path.join(BASE_DIR, 'image_cache'))
+IMAGE_CACHE_MAX_SIZE = 1024 ** 3
+IMAGE_RESIZE_MAX_SIDE = 2560
+
+# Полнотекстовый поиск (posts/search.py) отдаёт не больше стольких постов.
+SEARCH_MAX_RESULTS = 1000
+
+# Номерная пагинация (posts/paginators.py): начиная с такого числа записей
+# COUNT(*) оценивается или кешируется, а номер страницы ограничен сверху.
+PAGINATOR_COUNT_THRESHOLD = 10000
+PAGINATOR_COUNT_TIMEOUT = 60 * 5
+PAGINATOR_MAX_PAGES = 100
+
+# Метрики ответов (yatube/metrics.py) на /metrics в формате Prometheus.
+# Каждый процесс раз в METRICS_FLUSH_INTERVAL секунд сбрасывает свои
+# счётчики в METRICS_DIR, и /metrics отдаёт сумму по всем воркерам;
+# без каталога видны только счётчики обработавшего запрос процесса.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 5
+# Без токена /metrics открыт адресам METRICS_ALLOWED_IPS. За обратным
+# прокси REMOTE_ADDR у всех запросов один — адрес прокси, и там нужен
+# METRICS_TOKEN: Prometheus передаёт его в Authorization: Bearer.
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Профилирование запросов (yatube/profiling.py): по подписанному токену
+# со страницы /profiling/ или случайно 1 из PROFILING_SAMPLE_RATE
+# (0 — выключено). Хранятся последние PROFILING_MAX_SAMPLES замеров.
+PROFILING_DIR = os.environ.get(
+    'PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_SAMPLE_RATE = int(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_MAX_SAMPLES = 200
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
 
@@ -5,12 +5,17 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from yatube.metrics import metrics
+from yatube.profiling import profiling
+
 handler404 = 'posts.views.page_not_found'
 handler500 = 'posts.views.server_error'
 
 
 urlpatterns = [
     path('__debug__/', include(debug_toolbar.urls)),
+    path('metrics', metrics, name='metrics'),
+    path('profiling/', profiling, name='profiling'),
     path('', include('posts.urls')),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),